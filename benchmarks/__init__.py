@@ -0,0 +1,79 @@
+"""
+    Benchmarks of funcbuilder against lambdas and the operator module.
+
+    Each module has a `CASES` list of `(name, {variant: function})` pairs.
+    Functions receive no arguments and do the whole workload once.
+    Run every case from the repository root with:
+
+        python -m benchmarks [--quick] [--output results.json] [names...]
+
+    Memory used by expressions is measured by `python -m benchmarks.memory`.
+"""
+import json
+import platform
+import sys
+import timeit
+
+__all__ = 'MODULES', 'load_cases', 'measure', 'run'
+
+MODULES = ('bench_core', 'bench_map', 'bench_tools', 'bench_py_dot',
+           'bench_stream', 'bench_import')
+
+
+def load_cases(modules=MODULES):
+    """ List of (module, name, variants) of the benchmark modules
+    """
+    import importlib
+    out = []
+    for name in modules:
+        module = importlib.import_module('benchmarks.' + name)
+        out.extend((name, case, variants) for case, variants in module.CASES)
+    return out
+
+
+def measure(func, number, repeat):
+    """ Best time of a single call, in seconds
+    """
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def run(select=(), number=10, repeat=5):
+    """ Dictionary with the results ready to be saved as JSON.
+        `select` filters the cases containing any of the given strings.
+    """
+    import funcbuilder
+    results = []
+    for module, case, variants in load_cases():
+        if select and not any(s in module + '.' + case for s in select):
+            continue
+        for variant, func in variants.items():
+            results.append({'module': module, 'case': case,
+                            'variant': variant,
+                            'seconds': measure(func, number, repeat)})
+    return {'funcbuilder': funcbuilder.__version__,
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'number': number, 'repeat': repeat,
+            'results': results}
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description=__doc__.split('\n\n')[0])
+    parser.add_argument('select', nargs='*',
+                        help='run only cases containing these strings')
+    parser.add_argument('--quick', action='store_true',
+                        help='less repetitions, for a fast check')
+    parser.add_argument('--output', help='write JSON to this file')
+    args = parser.parse_args(argv)
+
+    number, repeat = (2, 2) if args.quick else (10, 5)
+    data = run(args.select, number, repeat)
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(data, fp, indent=2)
+    else:
+        json.dump(data, sys.stdout, indent=2)
+        print()
@@ -0,0 +1,80 @@
+"""
+    FuncBuilder objects as keys and plain functions
+"""
+import itertools
+import operator
+
+from funcbuilder import f, fuse, compile_expression
+
+from benchmarks.data import pairs, numbers, words, records
+
+key_pair = f[1]
+key_square = f ** 2 - 1
+key_attrs = f.point.imag
+key_strip = f.call('strip').call('lower')
+arith = (f * 3 + 1) % 7 - 2
+key_fused = fuse(f.name.call('upper'), f.point.imag, f.point.real)
+
+CASES = [
+    ('sorted key x[1]', {
+        'lambda': lambda: sorted(pairs, key=lambda x: x[1]),
+        'itemgetter': lambda: sorted(pairs, key=operator.itemgetter(1)),
+        'funcbuilder': lambda: sorted(pairs, key=key_pair),
+        'compiled': lambda: sorted(pairs, key=key_pair.compile()),
+    }),
+    ('sorted key x ** 2 - 1', {
+        'lambda': lambda: sorted(numbers, key=lambda x: x ** 2 - 1),
+        'funcbuilder': lambda: sorted(numbers, key=key_square),
+        'compiled': lambda: sorted(numbers, key=key_square.compile()),
+    }),
+    ('min/max key x.point.imag', {
+        'lambda': lambda: (min(records, key=lambda x: x.point.imag),
+                           max(records, key=lambda x: x.point.imag)),
+        'attrgetter': lambda: (min(records, key=operator.attrgetter('point.imag')),
+                               max(records, key=operator.attrgetter('point.imag'))),
+        'funcbuilder': lambda: (min(records, key=key_attrs),
+                                max(records, key=key_attrs)),
+        'compiled': lambda: (min(records, key=key_attrs.compile()),
+                             max(records, key=key_attrs.compile())),
+    }),
+    ('groupby key x.name', {
+        'lambda': lambda: [len(list(g)) for _, g in
+                           itertools.groupby(records, lambda x: x.name)],
+        'attrgetter': lambda: [len(list(g)) for _, g in
+                               itertools.groupby(records, operator.attrgetter('name'))],
+        'funcbuilder': lambda: [len(list(g)) for _, g in
+                                itertools.groupby(records, f.name)],
+    }),
+    ('getter chain x.point.imag', {
+        'lambda': lambda: list(map(lambda x: x.point.imag, records)),
+        'attrgetter': lambda: list(map(operator.attrgetter('point.imag'), records)),
+        'funcbuilder': lambda: list(map(key_attrs, records)),
+        'funcbuilder.map': lambda: list(key_attrs.map(records)),
+    }),
+    ('arithmetic chain (x * 3 + 1) % 7 - 2', {
+        'lambda': lambda: list(map(lambda x: (x * 3 + 1) % 7 - 2, numbers)),
+        'funcbuilder': lambda: list(map(arith, numbers)),
+        'compiled': lambda: list(map(arith.compile(), numbers)),
+    }),
+    ('call chain x.strip().lower()', {
+        'lambda': lambda: list(map(lambda x: x.strip().lower(), words)),
+        'methodcaller': lambda: list(map(operator.methodcaller('lower'),
+                                         map(operator.methodcaller('strip'), words))),
+        'funcbuilder': lambda: list(map(key_strip, words)),
+        'funcbuilder.map': lambda: list(key_strip.map(words)),
+    }),
+    ('sorted key (x.name.upper(), x.point.imag, x.point.real)', {
+        'lambda': lambda: sorted(records, key=lambda x: (x.name.upper(),
+                                                         x.point.imag,
+                                                         x.point.real)),
+        'fuse': lambda: sorted(records, key=key_fused),
+    }),
+    ('rebuild x.real * 2 + 1 and call it', {
+        'lambda': lambda: [(lambda x: x.real * 2 + 1)(x) for x in numbers[:1000]],
+        'funcbuilder': lambda: [(f.real * 2 + 1)(x) for x in numbers[:1000]],
+        'compile cache': lambda: [(f.real * 2 + 1).compile()(x)
+                                  for x in numbers[:1000]],
+        'compile': lambda: [compile_expression(f.real * 2 + 1)(x)
+                            for x in numbers[:1000]],
+    }),
+]
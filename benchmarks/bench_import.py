@@ -0,0 +1,35 @@
+"""
+    Import time of funcbuilder and creation of holder types.
+    The module code is compiled once, so only its execution is measured,
+    as when the bytecode is cached.
+"""
+import importlib.util
+import types
+
+import funcbuilder
+from funcbuilder import tools
+
+spec = importlib.util.find_spec('funcbuilder')
+with open(spec.origin, 'rb') as fp:
+    code = compile(fp.read(), spec.origin, 'exec')
+
+
+def execute():
+    module = types.ModuleType('funcbuilder_copy')
+    module.__file__ = spec.origin
+    exec(code, module.__dict__)
+    return module
+
+
+def new_holder_types():
+    return [tools.make_class.__wrapped__(t) for t in (int, str, list)]
+
+
+CASES = [
+    ('execute funcbuilder module', {
+        'funcbuilder': execute,
+    }),
+    ('make_class for 3 types', {
+        'tools': new_holder_types,
+    }),
+]
@@ -0,0 +1,35 @@
+"""
+    FuncBuilder.map/filter against plain map(lambda ...)
+"""
+from funcbuilder import f
+
+from benchmarks.data import records
+
+items = [(r.id, r.name, r.point) for r in records]
+
+imag = f.get(2).imag
+arith = (f[0] * 2 + 1) % 7
+odd = f[0] % 3
+
+CASES = [
+    ('map x[2].imag', {
+        'lambda': lambda: list(map(lambda x: x[2].imag, items)),
+        'funcbuilder': lambda: list(map(imag, items)),
+        'funcbuilder.map': lambda: list(imag.map(items)),
+    }),
+    ('map (x[0] * 2 + 1) % 7', {
+        'lambda': lambda: list(map(lambda x: (x[0] * 2 + 1) % 7, items)),
+        'funcbuilder': lambda: list(map(arith, items)),
+        'funcbuilder.map': lambda: list(arith.map(items)),
+    }),
+    ('filter x[0] % 3', {
+        'lambda': lambda: list(filter(lambda x: x[0] % 3, items)),
+        'funcbuilder': lambda: list(filter(odd, items)),
+        'funcbuilder.filter': lambda: list(odd.filter(items)),
+    }),
+    ('filter x[1] (getters)', {
+        'lambda': lambda: list(filter(lambda x: x[1], items)),
+        'funcbuilder': lambda: list(filter(f.get(1), items)),
+        'funcbuilder.filter': lambda: list(f.get(1).filter(items)),
+    }),
+]
@@ -0,0 +1,78 @@
+"""
+    Calls of py_dot Function and Lambda objects
+"""
+from funcbuilder.py_dot import Environment, Function, Lambda, var
+
+from benchmarks.data import pairs
+
+N = 1000
+
+def lambda_key():
+    return (Lambda(unpack=('x', 'y'))
+                .set(z=var.x ** 2 + 1)
+                .ret(var.y + var.z)
+            .end)
+
+def total():
+    return (Function('total', 'x')
+                .set(w=0)
+                .for_(i=var.x)
+                    .set(w=var.w + var.i)
+                .end
+                .ret(var.w)
+            .end)
+
+class Point:
+    x = 0
+    identity = Lambda('self', 'x').ret(var.x).end
+
+    def method(self, x):
+        return x
+
+inner = Environment().set(a=1)
+env = Environment().set(__parent__=inner, b=2, p=Point())
+
+scale = (env.def_(scale=('x',))
+             .set(y=var.x * var.b)
+             .ret(var.y + var.a)
+         .end).d['scale']
+
+identity = Lambda('x').ret(var.x).end
+native = lambda x: x
+point = Point()
+
+interpreted_key, compiled_key = lambda_key(), lambda_key().compile()
+interpreted_total, compiled_total = total(), total().compile()
+
+CASES = [
+    ('Call overhead of a Lambda and a method', {
+        'lambda': lambda: [native(i) for i in range(N)],
+        'method': lambda: [point.method(i) for i in range(N)],
+        'py_dot': lambda: [identity(i) for i in range(N)],
+        'py_dot method': lambda: [point.identity(i) for i in range(N)],
+    }),
+    ('Lambda(unpack) as sorted key', {
+        'lambda': lambda: sorted(pairs[:N], key=lambda p: p[1] + p[0] ** 2 + 1),
+        'py_dot': lambda: sorted(pairs[:N], key=interpreted_key),
+        'py_dot compiled': lambda: sorted(pairs[:N], key=compiled_key),
+    }),
+    ('Function with for_ loop', {
+        'python': lambda: sum(range(N)),
+        'py_dot': lambda: interpreted_total(range(N)),
+        'py_dot compiled': lambda: compiled_total(range(N)),
+    }),
+    ('Function reading locals and names of parent environments', {
+        'python': lambda: [x * 2 + 1 for x in range(N)],
+        'py_dot': lambda: [scale(x) for x in range(N)],
+    }),
+    ('Environment get name, attribute path and parent name', {
+        'dict': lambda: [(d['b'], d['p'].x, d['a'])
+                         for d in [{'b': 2, 'p': Point(), 'a': 1}] * N],
+        'py_dot': lambda: [(env.b, env.p__x, env.a) for _ in range(N)],
+    }),
+    ('Environment set name and attribute path', {
+        'dict': lambda: [d.update(b=i) or setattr(d['p'], 'x', i)
+                         for i, d in enumerate([{'p': Point()}] * N)],
+        'py_dot': lambda: [env.set(b=i, p__x=i) for i in range(N)],
+    }),
+]
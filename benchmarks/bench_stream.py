@@ -0,0 +1,37 @@
+"""
+    funcbuilder.stream against reading a file line by line
+"""
+import atexit
+import os
+import tempfile
+
+from funcbuilder import f
+from funcbuilder.stream import stream
+
+from benchmarks.data import records
+
+fd, path = tempfile.mkstemp(suffix='.tsv')
+with os.fdopen(fd, 'w') as out:
+    out.writelines('%d\t%s\t%s\t%d\n' % (r.id, r.name, r.point, r.id % 97)
+                   for r in records)
+atexit.register(os.remove, path)
+
+field = f.call('split', '\t')[3].int
+wanted = f.call('startswith', '1')
+bfield = f.call('split', b'\t')[3].int
+bwanted = f.call('startswith', b'1')
+
+
+def lines(path):
+    with open(path) as fp:
+        return [int(line.split('\t')[3]) for line in fp if line.startswith('1')]
+
+CASES = [
+    ('file field 3 where line starts with 1', {
+        'for line': lambda: lines(path),
+        'stream': lambda: list(stream(path, field, wanted)),
+        'stream mmap': lambda: list(stream(path, field, wanted, use_mmap=True)),
+        'stream binary': lambda: list(stream(path, bfield, bwanted,
+                                             binary=True)),
+    }),
+]
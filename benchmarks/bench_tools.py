@@ -0,0 +1,34 @@
+"""
+    FuncOperation, ApplyHelper and holder
+"""
+from funcbuilder import fop
+from funcbuilder.tools import ApplyHelper, holder
+
+from benchmarks.data import numbers
+
+
+def square(x):
+    return x * x
+
+
+def double(x):
+    return x * 2
+
+
+composed = fop(square) + fop(double) * fop(abs)
+
+CASES = [
+    ('FuncOperation square + double * abs', {
+        'lambda': lambda: list(map(lambda x: square(x) + double(x) * abs(x),
+                                   numbers)),
+        'funcoperation': lambda: list(map(composed, numbers)),
+    }),
+    ('ApplyHelper (x + 1) * 2', {
+        'plain': lambda: [(x + 1) * 2 for x in numbers],
+        'applyhelper': lambda: [((ApplyHelper(x) + 1) * 2)() for x in numbers],
+    }),
+    ('holder x + 1', {
+        'plain': lambda: [x + 1 for x in numbers],
+        'holder': lambda: [holder(x) + 1 for x in numbers],
+    }),
+]
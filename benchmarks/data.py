@@ -0,0 +1,19 @@
+"""
+    Data shared by the benchmarks
+"""
+N = 10000
+
+
+class Record:
+    __slots__ = 'id', 'name', 'point'
+
+    def __init__(self, id, name, point):
+        self.id = id
+        self.name = name
+        self.point = point
+
+
+pairs = [(i * 7919 % N, -i) for i in range(N)]
+numbers = [i * 7919 % N - N // 2 for i in range(N)]
+words = [' Word%d ' % (i % 100) for i in range(N)]
+records = [Record(i, 'name%d' % (i % 50), complex(i, -i)) for i in range(N)]
@@ -0,0 +1,61 @@
+"""
+    Memory used by FuncBuilder expressions, measured with tracemalloc.
+    Run from the repository root: python -m benchmarks.memory [--output file]
+"""
+import gc
+import json
+import sys
+import tracemalloc
+
+from funcbuilder import f
+
+N = 10000
+
+CASES = [
+    ('f.payload.user[i] * 2 + 1', lambda i: f.payload.user[i] * 2 + 1),
+    ("f.call('split', ',')[i].int", lambda i: f.call('split', ',')[i].int),
+    ('10 ops: (f + i) * 2 ...', lambda i: ((((f + i) * 2 - 1) % 7 + 3) ** 2
+                                            // 5 - i) * 3 + 1),
+    ('f[i] after a call', lambda i: called(f[i])),
+]
+
+
+def called(g):
+    g((0,) * N)
+    return g
+
+
+def measure(build, n=N):
+    """ Bytes kept alive by each expression
+    """
+    gc.collect()
+    tracemalloc.start()
+    keep = [build(i) for i in range(n)]
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del keep
+    return size / n
+
+
+def run():
+    import funcbuilder
+    return {'funcbuilder': funcbuilder.__version__,
+            'python': sys.version.split()[0],
+            'results': [{'case': name, 'bytes': measure(build)}
+                        for name, build in CASES]}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    data = run()
+    if argv[:1] == ['--output']:
+        with open(argv[1], 'w') as fp:
+            json.dump(data, fp, indent=2)
+    else:
+        json.dump(data, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -69,14 +69,19 @@ __version__ = '2.0'
 __all__ = ['FuncBuilder',
            'FuncOperation',
            'OperatorMachinery',
-           'f', 'fop', 'use']
+           'Profiler',
+           'f', 'fop', 'arg', 'impure', 'fuse', 'compile_cache']
 
 import operator
 import itertools as it
 import functools
 import collections
+import keyword
 from types import FunctionType
 
+from funcbuilder.cache import Cache, LFUCache
+from funcbuilder.profiler import Profiler
+
 operator.pow = pow
 
 ###############################################################################
@@ -105,6 +110,1146 @@ def show_(data):
     print(data)
     return data
 
+def chunks(iterable, size):
+    """ Split an iterable into lists of `size` items. The last one may
+        be smaller.
+    """
+    iterable = iter(iterable)
+    return iter(lambda: list(it.islice(iterable, size)), [])
+
+def identity(x):
+    """ Default function of a FuncBuilder without operations.
+    """
+    return x
+
+###############################################################################
+# Expression nodes
+
+BINARY_SYMBOLS = {'add': '+', 'sub': '-', 'mul': '*', 'truediv': '/',
+                  'floordiv': '//', 'mod': '%', 'pow': '**', 'matmul': '@',
+                  'lshift': '<<', 'rshift': '>>', 'and_': '&', 'or_': '|',
+                  'xor': '^', 'lt': '<', 'le': '<=', 'eq': '==', 'ne': '!=',
+                  'ge': '>=', 'gt': '>'}
+
+UNARY_SYMBOLS = {'neg': '-', 'pos': '+', 'invert': '~'}
+
+# Operators working element-wise on numpy arrays. In-place operators are
+# replaced by the normal ones to not change the array given by the user.
+VECTOR_UNARY = {'neg', 'pos', 'invert', 'abs'}
+VECTOR_BINARY = {'add', 'sub', 'mul', 'truediv', 'floordiv', 'mod', 'pow',
+                 'lshift', 'rshift', 'and_', 'or_', 'xor',
+                 'lt', 'le', 'eq', 'ne', 'ge', 'gt'}
+VECTOR_INPLACE = {'i' + name.rstrip('_'): getattr(operator, name)
+                  for name in VECTOR_BINARY - {'lt', 'le', 'eq', 'ne', 'ge', 'gt'}}
+
+def step(template, *consts):
+    """ A step of a compiled function: a Python expression on `{x}` (the
+        value so far) using the constants as positional fields.
+    """
+    return template, consts
+
+class Node:
+    """ One operation of a FuncBuilder expression applied to the value
+        computed by `parent` (`None` stands for the argument itself).
+        Nodes are never changed after creation, so every expression derived
+        from a FuncBuilder object shares its nodes.
+
+        Subclasses define `operation`, `step` or both: each one has a
+        default made from the other.
+    """
+    __slots__ = 'parent',
+
+    def __init__(self, parent):
+        self.parent = parent
+
+    def op(self):
+        """ Entry for the `op` list shown in the FuncBuilder representation
+        """
+        return type(self).__name__.lower()
+
+    def step(self):
+        """ Code used by `FuncBuilder.compile`
+        """
+        return step('{0}({x})', self.operation())
+
+    def vector_func(self, numpy):
+        """ Function doing the operation on a whole numpy array or None if
+            the operation can't be done element-wise by numpy.
+        """
+        return None
+
+    def getter(self):
+        """ `operator` getter doing the operation in C or None
+        """
+        return None
+
+    def operation(self):
+        """ Function of one argument doing the operation
+        """
+        return step_function(self)
+
+    def wrap(self, func):
+        """ Function doing the operation on the result of `func`
+        """
+        oper = self.operation()
+        if func is identity:
+            return oper
+        return lambda x: oper(func(x))
+
+    def __repr__(self):
+        return '<%s %r>' % (type(self).__name__, self.op())
+
+    def __init_subclass__(cls, **kw):
+        super().__init_subclass__(**kw)
+        cls.field_names = tuple(name for c in reversed(cls.__mro__)
+                                for name in getattr(c, '__slots__', ())
+                                if name != 'parent')
+
+    def fields(self):
+        """ Arguments to create the node again, except the parent
+        """
+        return tuple([getattr(self, name) for name in self.field_names])
+
+
+class Attr(Node):
+    """ `x.name`, where name may be dotted as in `operator.attrgetter`
+    """
+    __slots__ = 'name',
+
+    def __init__(self, parent, name):
+        super().__init__(parent)
+        self.name = name
+
+    def op(self):
+        return 'attr', self.name
+
+    def getter(self):
+        return operator.attrgetter(self.name)
+    operation = getter
+
+    def step(self):
+        names = self.name.split('.')
+        if all(i.isidentifier() and not keyword.iskeyword(i) for i in names):
+            return step('{x}.%s' % self.name)
+        return step('{0}({x})', operator.attrgetter(self.name))
+
+
+class Item(Node):
+    """ `operator.itemgetter(*keys)(x)`
+    """
+    __slots__ = 'keys',
+
+    def __init__(self, parent, keys):
+        super().__init__(parent)
+        self.keys = keys
+
+    def op(self):
+        return 'get', self.keys
+
+    def getter(self):
+        return operator.itemgetter(*self.keys)
+    operation = getter
+
+    def step(self):
+        if len(self.keys) == 1:
+            return step('{x}[{0}]', *self.keys)
+        return step('{0}({x})', operator.itemgetter(*self.keys))
+
+
+class Call(Node):
+    """ `x.name(*args, **kw)`
+    """
+    __slots__ = 'name', 'args', 'kw'
+
+    def __init__(self, parent, name, args, kw):
+        super().__init__(parent)
+        self.name = name
+        self.args = args
+        self.kw = kw
+
+    def op(self):
+        return 'call', '{0}{1}{2}'.format(self.name, self.args,
+                                          self.kw if self.kw else '')
+
+    def step(self):
+        names = (self.name,) + tuple(self.kw)
+        if not all(i.isidentifier() and not keyword.iskeyword(i)
+                   for i in names):
+            return step('{0}({x})', self.getter())
+        args = ['{%d}' % i for i in range(len(self.args))]
+        args += ['%s={%d}' % (k, i) for i, k in enumerate(self.kw,
+                                                          len(self.args))]
+        return step('{x}.%s(%s)' % (self.name, ', '.join(args)),
+                    *self.args + tuple(self.kw.values()))
+
+    def getter(self):
+        return operator.methodcaller(self.name, *self.args, **self.kw)
+    operation = getter
+
+
+class Builtin(Node):
+    """ Function of one argument, like the builtin properties: `func(x)`
+    """
+    __slots__ = 'func',
+
+    def __init__(self, parent, func):
+        super().__init__(parent)
+        self.func = func
+
+    def op(self):
+        return self.func.__name__
+
+    def step(self):
+        return step('{0}({x})', self.func)
+
+    def operation(self):
+        return self.func
+
+    def vector_func(self, numpy):
+        # `round` isn't here: numpy.round returns floats instead of ints
+        return numpy.abs if self.func is abs else None
+
+
+class UnaryOp(Node):
+    """ `oper(x)` for unary operators
+    """
+    __slots__ = 'oper',
+
+    def __init__(self, parent, oper):
+        super().__init__(parent)
+        self.oper = oper
+
+    def op(self):
+        return self.oper.__name__
+
+    def step(self):
+        name = self.oper.__name__
+        if name in UNARY_SYMBOLS:
+            return step(UNARY_SYMBOLS[name] + '{x}')
+        return step('{0}({x})', self.oper)
+
+    def operation(self):
+        return self.oper
+
+    def vector_func(self, numpy):
+        return self.oper if self.oper.__name__ in VECTOR_UNARY else None
+
+
+class BinOp(Node):
+    """ `oper(x, *args)` or `oper(args[0], x)` when `reverse` is set.
+        Operators may take more than one extra operand, as in `pow(x, 2, 5)`
+    """
+    __slots__ = 'oper', 'args', 'reverse'
+
+    def __init__(self, parent, oper, args, reverse=False):
+        super().__init__(parent)
+        self.oper = oper
+        self.args = args
+        self.reverse = reverse
+
+    def op(self):
+        if self.reverse:
+            return self.args[0], self.oper.__name__
+        return self.oper.__name__, (self.args[0] if len(self.args) == 1
+                                    else self.args)
+
+    def step(self):
+        name, n = self.oper.__name__, self.args
+        if len(n) == 1 and name in BINARY_SYMBOLS:
+            template = '{0} %s {x}' if self.reverse else '{x} %s {0}'
+            return step(template % BINARY_SYMBOLS[name], *n)
+        if len(n) == 1 and name == 'getitem':
+            return step('{0}[{x}]' if self.reverse else '{x}[{0}]', *n)
+        if self.reverse:
+            return step('{0}({1}, {x})', self.oper, *n)
+        args = ''.join(', {%d}' % i for i in range(1, len(n) + 1))
+        return step('{0}({x}%s)' % args, self.oper, *n)
+
+    def operation(self):
+        return self.wrap(identity)
+
+    def getter(self):
+        if (self.oper is operator.getitem and not self.reverse and
+                len(self.args) == 1):
+            return operator.itemgetter(self.args[0])
+        return None
+
+    def wrap(self, func):
+        oper, n = self.oper, self.args
+        if self.reverse:
+            return lambda x: oper(n[0], func(x))
+        return lambda x: oper(func(x), *n)
+
+    def vector_func(self, numpy):
+        name, n = self.oper.__name__, self.args
+        if len(n) != 1 or isinstance(n[0], FuncBuilder):
+            return None
+        if name not in VECTOR_BINARY and name not in VECTOR_INPLACE:
+            return None
+        oper = VECTOR_INPLACE.get(name, self.oper)
+        if self.reverse:
+            return lambda x: oper(n[0], x)
+        return lambda x: oper(x, n[0])
+
+
+class Count(Node):
+    """ `operator.countOf(x, arg)`
+    """
+    __slots__ = 'arg',
+
+    def __init__(self, parent, arg):
+        super().__init__(parent)
+        self.arg = arg
+
+    def op(self):
+        return 'count', self.arg
+
+    def step(self):
+        return step('{0}({x}, {1})', operator.countOf, self.arg)
+
+    def operation(self):
+        arg = self.arg
+        return lambda x: operator.countOf(x, arg)
+
+
+class Has(Count):
+    """ `arg in x`
+    """
+    __slots__ = ()
+
+    def op(self):
+        return 'has', self.arg
+
+    def step(self):
+        return step('{0} in {x}', self.arg)
+
+    def operation(self):
+        arg = self.arg
+        return lambda x: arg in x
+
+
+class Apply(Node):
+    """ Any function given to a FuncBuilder object without an expression.
+        It is opaque and has no entry in the `op` list.
+    """
+    __slots__ = 'func',
+
+    def __init__(self, parent, func):
+        super().__init__(parent)
+        self.func = func
+
+    def op(self):
+        return None
+
+    def step(self):
+        return step('{0}({x})', self.func)
+
+    def operation(self):
+        return self.func
+
+
+class Custom(Node):
+    """ Operation of a method decorated by `function` that returns a
+        `(function, op)` pair. Without a parent, the function receives the
+        argument of the whole expression (see `function_final`), and the
+        operations of `previous` are only shown in the `op` list.
+    """
+    __slots__ = 'func', 'entry', 'previous'
+
+    def __init__(self, parent, func, entry, previous=None):
+        super().__init__(parent)
+        self.func = func
+        self.entry = entry
+        self.previous = previous
+
+    def op(self):
+        return self.entry
+
+    def operation(self):
+        return self.func
+
+
+class Cached(Node):
+    """ Expression with the results cached, made by `FuncBuilder.cached`.
+        It has no parent: the cache receives the argument of the expression.
+    """
+    __slots__ = 'expr', 'maxsize', 'policy', 'typed', 'cache'
+
+    def __init__(self, parent, expr, maxsize, policy, typed):
+        super().__init__(parent)
+        if expr._params:
+            raise TypeError('Expressions with placeholders cannot be cached')
+        self.expr = expr
+        self.maxsize = maxsize
+        self.policy = policy
+        self.typed = typed
+        self.cache = Cache(expr.compile(), maxsize, policy, typed)
+
+    def op(self):
+        return 'cached', self.expr.op
+
+    def fields(self):
+        return self.expr, self.maxsize, self.policy, self.typed
+
+    def step(self):
+        return step('{0}({x})', self.cache)
+
+    def operation(self):
+        return self.cache
+
+
+class Choice(Node):
+    """ Base for the lazy combinators. Like `Cached`, they have no parent:
+        the operands are FuncBuilder expressions of the argument, evaluated
+        only when needed, or values used as they are.
+    """
+    __slots__ = 'exprs',
+
+    def __init__(self, parent, *exprs):
+        super().__init__(parent)
+        if any(isinstance(e, FuncBuilder) and e._params for e in exprs):
+            raise TypeError('Expressions with placeholders cannot be used '
+                            'in conditions')
+        self.exprs = exprs
+
+    def op(self):
+        return (self.kind,) + tuple(e.op if isinstance(e, FuncBuilder) else e
+                                    for e in self.exprs)
+
+    def fields(self):
+        return self.exprs
+
+    def template(self):
+        """ Code evaluating each operand and the compiled operands
+        """
+        code, consts = [], []
+        for e in self.exprs:
+            if isinstance(e, FuncBuilder) and e._node is None:
+                code.append('{x}')
+                continue
+            code.append('{%d}({x})' % len(consts) if isinstance(e, FuncBuilder)
+                        else '{%d}' % len(consts))
+            consts.append(e.compile() if isinstance(e, FuncBuilder) else e)
+        return code, consts
+
+    def functions(self):
+        """ Function of the argument for each operand
+        """
+        return [e.func if isinstance(e, FuncBuilder)
+                else (lambda x, value=e: value) for e in self.exprs]
+
+    def vector_funcs(self, numpy):
+        """ Function of a numpy array for each operand or None
+        """
+        funcs = []
+        for e in self.exprs:
+            if not isinstance(e, FuncBuilder):
+                funcs.append(lambda x, value=e: value)
+                continue
+            funcs.append(vector_function(e._node, numpy))
+            if funcs[-1] is None:
+                return None
+        return funcs
+
+
+class IfElse(Choice):
+    """ `then(x) if cond(x) else other(x)`
+    """
+    __slots__ = ()
+    kind = 'if_else'
+
+    def step(self):
+        (cond, then, other), consts = self.template()
+        return step('(%s if %s else %s)' % (then, cond, other), *consts)
+
+    def operation(self):
+        cond, then, other = self.functions()
+        return lambda x: then(x) if cond(x) else other(x)
+
+    def vector_func(self, numpy):
+        funcs = self.vector_funcs(numpy)
+        if funcs is None:
+            return None
+        cond, then, other = funcs
+        return lambda x: select(numpy, x, numpy.asarray(cond(x), bool),
+                                then, other)
+
+
+class AndThen(Choice):
+    """ `first(x) and second(x)`
+    """
+    __slots__ = ()
+    kind = 'and_then'
+
+    def step(self):
+        code, consts = self.template()
+        return step('(%s and %s)' % tuple(code), *consts)
+
+    def operation(self):
+        first, second = self.functions()
+        return lambda x: first(x) and second(x)
+
+    def vector_func(self, numpy):
+        funcs = self.vector_funcs(numpy)
+        if funcs is None:
+            return None
+        first, second = funcs
+        def vector(x):
+            value = numpy.asarray(first(x))
+            mask = value.astype(bool)
+            return select(numpy, x, mask, second, lambda part: value[~mask])
+        return vector
+
+
+class OrElse(Choice):
+    """ `first(x) or second(x)`
+    """
+    __slots__ = ()
+    kind = 'or_else'
+
+    def step(self):
+        code, consts = self.template()
+        return step('(%s or %s)' % tuple(code), *consts)
+
+    def operation(self):
+        first, second = self.functions()
+        return lambda x: first(x) or second(x)
+
+    def vector_func(self, numpy):
+        funcs = self.vector_funcs(numpy)
+        if funcs is None:
+            return None
+        first, second = funcs
+        def vector(x):
+            value = numpy.asarray(first(x))
+            mask = value.astype(bool)
+            return select(numpy, x, mask, lambda part: value[mask], second)
+        return vector
+
+
+class Coalesce(Choice):
+    """ First operand that is not None (or the last one)
+    """
+    __slots__ = ()
+    kind = 'coalesce'
+
+    def step(self):
+        return step('{0}({x})', self.operation())
+
+    def operation(self):
+        *funcs, last = self.functions()
+        def coalesce(x):
+            for func in funcs:
+                value = func(x)
+                if value is not None:
+                    return value
+            return last(x)
+        return coalesce
+
+
+def select(numpy, array, mask, then, other):
+    """ Array with `then` of the elements where `mask` is true and `other`
+        of the others, evaluating each function only on its elements.
+        Results that are not numbers (like strings or None) are kept as
+        they are in an array of objects.
+    """
+    yes, no = then(array[mask]), other(array[~mask])
+    if all(numpy.asarray(i).dtype.kind in 'biufc' for i in (yes, no)):
+        dtype = numpy.result_type(yes, no)
+    else:
+        dtype = object
+    out = numpy.empty(array.shape, dtype)
+    out[mask] = yes
+    out[~mask] = no
+    return out
+
+
+class Arg(Node):
+    """ Placeholder for an argument, created by `arg`. It has no parent.
+    """
+    __slots__ = 'name',
+
+    def __init__(self, parent, name):
+        super().__init__(parent)
+        self.name = name
+
+    def op(self):
+        return 'arg', self.name
+
+    def step(self):
+        raise TypeError('placeholders are compiled by `Compiler.emit`')
+
+    def operation(self):
+        raise TypeError('placeholders are compiled by `Compiler.emit`')
+
+
+# Longest expression evaluated by nested calls, which use a stack frame
+# for each operation. Longer ones are evaluated by `loop_function`.
+NESTING_LIMIT = 200
+
+def node_function(node):
+    """ Function evaluating the expression of `node` with nested calls.
+        Expressions doing a single getter (see `getters`) use it directly.
+    """
+    funcs = getters(node)
+    if funcs is not None and len(funcs) == 1:
+        return funcs[0]
+    nodes = list(iter_nodes(node))
+    if len(nodes) > NESTING_LIMIT:
+        return loop_function(nodes)
+    func = identity
+    for n in nodes:
+        func = n.wrap(func)
+    return func
+
+def loop_function(nodes):
+    """ Function evaluating the operations of `nodes` in a loop, with the
+        same stack depth for expressions of any length.
+    """
+    funcs = [n.operation() for n in nodes]
+    def evaluate(x):
+        for func in funcs:
+            x = func(x)
+        return x
+    return evaluate
+
+def vector_function(node, numpy):
+    """ Function evaluating the expression of `node` on a whole numpy
+        array or None if some operation can't be vectorized.
+    """
+    funcs = [n.vector_func(numpy) for n in iter_nodes(node)]
+    if any(func is None for func in funcs):
+        return None
+    def vector(array):
+        for func in funcs:
+            array = func(array)
+        return array
+    return vector
+
+def params(node):
+    """ Names of the placeholders used by a node
+    """
+    if isinstance(node, Arg):
+        return node.name,
+    if isinstance(node, BinOp):
+        return tuple(i for n in node.args if isinstance(n, FuncBuilder)
+                     for i in n._params)
+    return ()
+
+def merge_params(*groups):
+    """ Join tuples of placeholder names, keeping the first occurrences
+    """
+    return tuple(collections.OrderedDict.fromkeys(it.chain(*groups)))
+
+def iter_nodes(node):
+    """ Nodes of an expression from the first operation to `node`
+    """
+    nodes = []
+    while node is not None:
+        nodes.append(node)
+        node = node.parent
+    return reversed(nodes)
+
+def shown_nodes(node):
+    """ Nodes of the `op` list of an expression, including those replaced
+        by methods decorated by `function_final`
+    """
+    nodes = list(iter_nodes(node))
+    while (nodes and isinstance(nodes[0], Custom) and
+           nodes[0].previous is not None):
+        nodes[:0] = iter_nodes(nodes[0].previous)
+    return nodes
+
+def build_nodes(nodes, node=None):
+    """ Create again the nodes from a list of `(type, fields)` pairs,
+        starting from `node`.
+    """
+    for kind, fields in nodes:
+        node = kind(node, *fields)
+    return node
+
+def rebuild(cls, nodes, var_cnt):
+    """ Unpickle a FuncBuilder object.
+    """
+    obj = cls(None, build_nodes(nodes))
+    obj.var_cnt = var_cnt
+    obj.func = obj._compile_on_call
+    return obj
+
+# Types compared by value in fingerprints without further checks
+SIMPLE_TYPES = {bool, bytes, int, str, type(None), type(abs), type(identity)}
+
+class Identity:
+    """ Key of a value compared by identity. It keeps the value, so its id
+        can't be reused by another object.
+    """
+    __slots__ = 'value',
+
+    def __init__(self, value):
+        self.value = value
+
+    def __hash__(self):
+        return id(self.value)
+
+    def __eq__(self, other):
+        return type(other) is Identity and other.value is self.value
+
+def value_key(value):
+    """ Hashable key of a value in an expression. Values are compared with
+        their type, so `f + 1` and `f + 1.0` are different, and floats by
+        their exact representation, so `0.0` and `-0.0` are different too.
+        Values of other types, which may be equal but not the same (as
+        `Decimal('1.0')` and `Decimal('1.00')`), are compared by identity.
+    """
+    kind = type(value)
+    if kind in SIMPLE_TYPES:
+        return kind, value
+    if kind is float:
+        return kind, value.hex()
+    if kind is complex:
+        return kind, value.real.hex(), value.imag.hex()
+    if isinstance(value, FuncBuilder):
+        return value.fingerprint()
+    if kind is tuple:
+        return kind, tuple(map(value_key, value))
+    if kind is dict:
+        return kind, tuple((value_key(k), value_key(v))
+                           for k, v in value.items())
+    return Identity(value)
+
+def node_key(node):
+    """ Structural key of a node, see `FuncBuilder.fingerprint`. Cached
+        nodes raise TypeError: each one has its own cache, which the
+        compiled functions shouldn't keep alive.
+    """
+    if isinstance(node, Cached):
+        raise TypeError('Cached expressions have no fingerprint')
+    return (type(node),) + tuple([value_key(i) for i in node.fields()])
+
+###############################################################################
+# Purity
+
+# Functions whose results can't be reused: they may change something or
+# give a different result each time.
+IMPURE = {iter, next, open, print, show, show_}
+
+def impure(func):
+    """ Mark `func` as impure: it is called every time it appears in an
+        expression, even when the common parts are computed only once.
+        Returns the function, so it can be used as decorator.
+
+        >>> counter = iter(range(10))
+        >>> tick = impure(lambda x: next(counter))
+        >>> g = fop(tick) - fop(tick)
+        >>> g(None)
+        -1
+    """
+    IMPURE.add(func)
+    return func
+
+def is_impure(func):
+    """ Check if `func` was marked by `impure`
+    """
+    try:
+        return func in IMPURE
+    except TypeError: # Unhashable
+        return False
+
+def is_pure(node):
+    """ Check if the value of a node can be reused
+    """
+    if isinstance(node, Choice):
+        return all(is_pure(n) for e in node.exprs if isinstance(e, FuncBuilder)
+                   for n in iter_nodes(e._node))
+    return not (isinstance(node, (Builtin, Apply)) and is_impure(node.func))
+
+###############################################################################
+# Optimization
+
+# Builtins where `func(func(x)) == func(x)`
+IDEMPOTENT = {abs, bool, float, frozenset, int, round, set, sorted, str,
+              tuple}
+
+# Operators with integer constants that can be folded: `sub` is done as
+# `add` of the negative value.
+FOLD_IDENTITY = {'add': 0, 'sub': 0, 'mul': 1}
+
+def foldable(node):
+    """ Binary operation with an integer constant that can be merged with
+        others of the same kind.
+    """
+    return (isinstance(node, BinOp) and not node.reverse and
+            node.oper.__name__ in FOLD_IDENTITY and len(node.args) == 1 and
+            type(node.args[0]) in (int, bool))
+
+def merge(a, b):
+    """ List of nodes replacing the node `a` followed by `b` or None if the
+        pair can't be changed.
+    """
+    if isinstance(a, Attr) and isinstance(b, Attr):
+        return [Attr(None, a.name + '.' + b.name)]
+
+    if (isinstance(a, Builtin) and isinstance(b, Builtin) and
+            a.func is b.func and a.func in IDEMPOTENT):
+        return [a]
+
+    if isinstance(a, UnaryOp) and isinstance(b, UnaryOp):
+        name = a.oper.__name__
+        if name != b.oper.__name__:
+            return None
+        if name == 'abs':
+            return [a]
+        if name in ('neg', 'invert'):
+            return []
+        return None
+
+    if foldable(a) and foldable(b):
+        names = a.oper.__name__, b.oper.__name__
+        if names == ('mul', 'mul'):
+            return [BinOp(None, operator.mul, (a.args[0] * b.args[0],))]
+        if 'mul' in names:
+            return None
+        value = sum(-n.args[0] if n.oper is operator.sub else n.args[0]
+                    for n in (a, b))
+        return [BinOp(None, operator.add, (value,))]
+
+    return None
+
+def identity_op(node):
+    """ Check if the operation does nothing, like `x + 0` or `x * 1`
+    """
+    return (foldable(node) and
+            node.args[0] == FOLD_IDENTITY[node.oper.__name__])
+
+def optimize_nodes(node, changes=None):
+    """ Peephole optimization of an expression. Adjacent attributes are
+        merged, repeated idempotent builtins and double negations are
+        removed and integer constants of `+`, `-` and `*` are folded.
+        Descriptions of the changes are appended to the `changes` list.
+
+        Only the attribute merging is exact for every type. The other rules
+        assume the argument is an integer: `x + 1 - 1` is replaced by `x`,
+        which changes `0.1 + 1 - 1`, and `x + 0` doesn't raise for strings.
+        Float constants are never folded, but float arguments are. Double
+        negations also change the type of `~~True` and the value of `-(-x)`
+        for a Counter.
+    """
+    out = []
+    changed = False
+    for n in iter_nodes(node):
+        new = [n]
+        while new:
+            n = new.pop()
+            if identity_op(n):
+                if changes is not None:
+                    changes.append('%r -> []' % (n.op(),))
+                changed = True
+                continue
+            merged = merge(out[-1], n) if out else None
+            if merged is None:
+                out.append(n)
+                continue
+            if changes is not None:
+                changes.append('%r %r -> %r' % (out[-1].op(), n.op(),
+                                                [i.op() for i in merged]))
+            changed = True
+            out.pop()
+            new.extend(merged)
+
+    if not changed:
+        return node
+    # Keep the nodes before the first change, which may be shared
+    nodes = list(iter_nodes(node))
+    keep = 0
+    while (keep < len(out) and keep < len(nodes) and
+           out[keep] is nodes[keep]):
+        keep += 1
+    return build_nodes(((type(n), n.fields()) for n in out[keep:]),
+                       nodes[keep - 1] if keep else None)
+
+def getters(node):
+    """ List of `operator` getters doing the expression of `node` or None if
+        some operation is not a getter. Attribute lookups in sequence are
+        merged in a single `attrgetter`.
+    """
+    out, names = [], []
+    for n in iter_nodes(node):
+        if isinstance(n, Attr):
+            names.append(n.name)
+            continue
+        if names:
+            out.append(operator.attrgetter('.'.join(names)))
+            names = []
+        out.append(n.getter())
+        if out[-1] is None:
+            return None
+    if names:
+        out.append(operator.attrgetter('.'.join(names)))
+    return out
+
+class Compiler:
+    """ Generate a single function for the nodes of an expression, with
+        the constants bound as globals of the new function.
+
+        The argument of the expression is `_x` and placeholders made by
+        `arg` are the other parameters, in order of appearance. Operands
+        using placeholders are evaluated in the same function. With
+        `placeholders` set, every FuncBuilder operand is evaluated there,
+        so plain `f` operands use the argument `_x` instead of a new one.
+
+        Nodes shared by the expression and its operands, as `base` in
+        `base * 2 + base ** 2`, are computed once and kept in variables,
+        unless their value depends on a function marked by `impure`.
+    """
+    def __init__(self, placeholders=False):
+        self.namespace = {}
+        self.body = []
+        self.params = []
+        self.placeholders = placeholders
+        self.uses_input = False
+        self.names = it.count()
+        self.counts = collections.Counter() # node: expressions using it
+        self.shared = {} # node or id of FuncOperation: variable
+        self.tainted = set() # variables computed by impure functions
+
+    def const(self, value):
+        """ Name of a constant or of the variable computing an operand
+        """
+        if self.inline(value):
+            return self.emit(value._node, '_v%d' % next(self.names))
+        name = '_c%d' % next(self.names)
+        self.namespace[name] = value
+        return name
+
+    def inline(self, value):
+        """ Whether the operand `value` is computed in the compiled function
+        """
+        return isinstance(value, FuncBuilder) and bool(value._params or
+                                                       self.placeholders)
+
+    def count(self, node):
+        """ Count the expressions using each node, following the operands
+            with placeholders once per node using them.
+        """
+        pending = [node]
+        while pending:
+            for n in iter_nodes(pending.pop()):
+                self.counts[n] += 1
+                if self.counts[n] == 1 and isinstance(n, BinOp):
+                    pending.extend(i._node for i in n.args if self.inline(i))
+
+    def emit(self, node, var):
+        """ Add the lines computing the expression of `node` in `var`,
+            starting from the last node already kept in a variable, and
+            return the variable with the result.
+        """
+        nodes = list(iter_nodes(node))
+        start, src = 0, '_x'
+        for i in range(len(nodes) - 1, -1, -1):
+            if nodes[i] in self.shared:
+                start, src = i + 1, self.shared[nodes[i]]
+                break
+        else:
+            if nodes and isinstance(nodes[0], Arg):
+                if nodes[0].name not in self.params:
+                    self.params.append(nodes[0].name)
+                start, src = 1, nodes[0].name
+            else:
+                self.uses_input = True
+
+        pure = True
+        for i, n in enumerate(nodes[start:], start):
+            template, consts = n.step()
+            names = [self.const(c) for c in consts]
+            self.body.append('%s = %s' % (var, template.format(*names, x=src)))
+            src = var
+            pure = pure and is_pure(n)
+            uses = self.counts[n]
+            if pure and uses > 1 and (i + 1 == len(nodes) or
+                                      self.counts[nodes[i + 1]] < uses):
+                src = self.shared[n] = '_s%d' % next(self.names)
+                self.body.append('%s = %s' % (src, var))
+        return src
+
+    def function(self, node, var='_x'):
+        """ Compile the expression of `node`. Expressions with placeholders
+            must not be computed in `_x`, which may be used by operands.
+        """
+        self.count(node)
+        var = self.emit(node, var)
+        params = (['_x'] if self.uses_input else []) + self.params
+        body = ''.join('    %s\n' % line for line in self.body)
+        source = 'def compiled(%s):\n%s    return %s\n' % (', '.join(params),
+                                                          body, var)
+        exec(source, self.namespace)
+        return self.namespace['compiled']
+
+    def combine(self, obj):
+        """ Add the lines computing the FuncOperation `obj` from `args` and
+            `kw` and return its variable. Operands built with operators are
+            computed in the same function and repeated functions or
+            operands are computed once, except impure ones.
+        """
+        if isinstance(obj, FuncOperation) and obj.operation is None:
+            obj = obj.func
+        if id(obj) in self.shared:
+            return self.shared[id(obj)]
+        var = '_v%d' % next(self.names)
+        if not isinstance(obj, FuncOperation):
+            leaf = '_c%d' % next(self.names)
+            self.namespace[leaf] = obj
+            self.body.append('%s = %s(*args, **kw)' % (var, leaf))
+            pure = not is_impure(obj)
+        else:
+            oper, operands = obj.operation
+            names = [self.combine(i) for i in operands]
+            name = oper.__name__
+            if len(names) == 2 and name in BINARY_SYMBOLS:
+                expr = '%s %s %s' % (names[0], BINARY_SYMBOLS[name], names[1])
+            elif len(names) == 1 and name in UNARY_SYMBOLS:
+                expr = UNARY_SYMBOLS[name] + names[0]
+            else:
+                expr = '%s(%s)' % (self.const(oper), ', '.join(names))
+            self.body.append('%s = %s' % (var, expr))
+            pure = self.tainted.isdisjoint(names)
+        if pure:
+            self.shared[id(obj)] = var
+        else:
+            self.tainted.add(var)
+        return var
+
+def operation_function(obj):
+    """ Single function for the tree of operators of a FuncOperation object
+    """
+    compiler = Compiler()
+    var = compiler.combine(obj)
+    body = ''.join('    %s\n' % line for line in compiler.body)
+    source = 'def composed(*args, **kw):\n%s    return %s\n' % (body, var)
+    exec(source, compiler.namespace)
+    return compiler.namespace['composed']
+
+class Structure:
+    """ Expression compared by its fingerprint, used as key of
+        `compile_cache`. The options of the class changing the compiled
+        function are part of the key. The expression is removed once
+        compiled, so the cache keeps only the key.
+    """
+    __slots__ = 'expr', 'key'
+
+    def __init__(self, expr):
+        self.expr = expr
+        self.key = expr.auto_optimize, expr.fingerprint()
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+def compile_expression(expr):
+    """ Function made by `FuncBuilder.compile`, without the cache
+    """
+    node = expr._node
+    if expr.auto_optimize:
+        node = optimize_nodes(node)
+    if expr._params:
+        return Compiler(placeholders=True).function(node, '_r')
+    return Compiler().function(node)
+
+# Compiled functions shared by equal expressions of the whole process. Use
+# `compile_cache.cache_info()` and `compile_cache.cache_clear()`.
+compile_cache = Cache(lambda structure: compile_expression(structure.expr),
+                      maxsize=256)
+
+def step_function(node):
+    """ Function doing only the operation of `node`
+    """
+    template, consts = node.step()
+    namespace = {'_c%d' % i: c for i, c in enumerate(consts)}
+    source = 'def step(_x):\n    return %s\n' % template.format(*namespace,
+                                                                  x='_x')
+    exec(source, namespace)
+    return namespace['step']
+
+###############################################################################
+# Fusion
+
+def fusion_nodes(node):
+    """ Nodes of an expression with dotted attributes split, so that
+        `f.a.b` and `f.attr('a.b')` have the same prefixes.
+    """
+    for n in iter_nodes(node):
+        if isinstance(n, Attr) and '.' in n.name:
+            for name in n.name.split('.'):
+                yield Attr(None, name)
+        else:
+            yield n
+
+def prefix_key(node):
+    """ Key of equal operations for the prefix tree of `fuse`. Impure and
+        unhashable operations are never equal to others.
+    """
+    if not is_pure(node):
+        return node
+    try:
+        return node_key(node)
+    except TypeError:
+        return node
+
+def fuse(*exprs):
+    """ Single function returning a tuple with the results of the
+        expressions. The common prefixes of the expressions are computed
+        once, so it is a good key for sorting by many fields:
+
+        >>> pairs = [(1, 'b'), (2, 'a'), (1, 'a')]
+        >>> sorted(pairs, key=fuse(f[1], -f[0]))
+        [(2, 'a'), (1, 'a'), (1, 'b')]
+        >>> class Record:
+        ...     reads = 0
+        ...     @property
+        ...     def user(self):
+        ...         Record.reads += 1
+        ...         return complex(3, 4)
+        >>> fuse(f.user.real, f.user.imag, abs(f.user))(Record()), Record.reads
+        ((3.0, 4.0, 5.0), 1)
+
+        Only attributes are done by `operator.attrgetter`:
+
+        >>> fuse(f.real, f.imag)
+        operator.attrgetter('real', 'imag')
+    """
+    exprs = [e if isinstance(e, FuncBuilder) else FuncBuilder(e)
+             for e in exprs]
+    if any(e._params for e in exprs):
+        raise TypeError('Expressions with placeholders cannot be fused')
+    nodes = [list(fusion_nodes(e._node)) for e in exprs]
+    if len(exprs) > 1 and all(ns and all(isinstance(n, Attr) for n in ns)
+                              for ns in nodes):
+        return operator.attrgetter(*('.'.join(n.name for n in ns)
+                                     for ns in nodes))
+
+    compiler = Compiler()
+    tree = {} # (variable, node key): variable of the node
+    results = []
+    for expr in nodes:
+        var = '_x'
+        for n in expr:
+            key = var, prefix_key(n)
+            if key not in tree:
+                template, consts = n.step()
+                names = [compiler.const(c) for c in consts]
+                tree[key] = '_t%d' % next(compiler.names)
+                compiler.body.append('%s = %s' % (
+                    tree[key], template.format(*names, x=var)))
+            var = tree[key]
+        results.append(var)
+
+    body = ''.join('    %s\n' % line for line in compiler.body)
+    source = 'def fused(_x):\n%s    return (%s)\n' % (
+        body, ''.join(var + ', ' for var in results))
+    exec(source, compiler.namespace)
+    return compiler.namespace['fused']
+
 ###############################################################################
 # Function management / Decorators
 
@@ -116,12 +1261,16 @@ def copy_function(func):
 
 def function(f, make_lambda=True):
     """ Decorate methods from FuncBuilder to return a new FuncBuilder instance
-        Methods must return [function, operation]
+        Methods return the node of the new operation or [function, operation]
+        where the function receives the result of the expression so far.
     """
     def FuncBuilderDecorator(self, *args, **kw):
-        out, op = f(self, *args, **kw)
-        out_fnc = (lambda x: out(self(x))) if make_lambda else out
-        return type(self)(out_fnc, op, self)
+        node = f(self, *args, **kw)
+        if not isinstance(node, Node):
+            out, op = node
+            node = (Custom(self._node, out, op) if make_lambda
+                    else Custom(None, out, op, self._node))
+        return type(self)(None, node, self)
 
     functools.update_wrapper(FuncBuilderDecorator, f)
     return FuncBuilderDecorator
@@ -142,12 +1291,28 @@ def function_replacement(f):
         >>> g('  5.001e2  ')
         0.002
     """
-    func = lambda self: (lambda x: f(self(x)), f.__name__)
-    return property(function_final(func))
+    func = lambda self: Builtin(self._node, f)
+    return property(function(func))
 
 ###############################################################################
 # Metaclasses
 
+# Operators from the `operator` module used as special methods. Binary
+# operators also have the reflected (`__radd__`) and in-place versions.
+BINARY_OPERATORS = ('add', 'sub', 'mul', 'matmul', 'truediv', 'floordiv',
+                    'mod', 'pow', 'lshift', 'rshift', 'and_', 'xor', 'or_')
+OTHER_OPERATORS = ('neg', 'pos', 'invert', 'abs', 'index',
+                   'lt', 'le', 'eq', 'ne', 'ge', 'gt',
+                   'getitem', 'setitem', 'delitem', 'contains')
+
+# (special method, reflected special method or None, operator function)
+OPERATORS = tuple(
+    [('__%s__' % i.rstrip('_'), '__r%s__' % i.rstrip('_'), getattr(operator, i))
+     for i in BINARY_OPERATORS] +
+    [('__i%s__' % i.rstrip('_'), None, getattr(operator, 'i' + i.rstrip('_')))
+     for i in BINARY_OPERATORS] +
+    [('__%s__' % i, None, getattr(operator, i)) for i in OTHER_OPERATORS])
+
 class OperatorMachinery(type):
     """ Subclass of type to be used as metaclass for helping
         add operator support to objects
@@ -158,13 +1323,9 @@ class OperatorMachinery(type):
             these will be created to apply the operator on `self.operand`.
             A new object from the same type is created and the result of this
             operation is passed as the only argument.
+            The special methods are listed on `OPERATORS`.
         """
-        attr = '__{0}{1}__'
-
-        for op in (x for x in dir(operator) if not x.startswith('__')):
-            oper = getattr(operator, op)
-            op = op.rstrip('_') #special case for keywords: and_, or_
-            
+        for name, rname, oper in OPERATORS:
             if not funcs:
                 def func(self, *n, oper=oper):
                     return type(self)(oper(self.operand, *n))
@@ -177,27 +1338,45 @@ class OperatorMachinery(type):
                 func, rfunc = (copy_function(i) for i in funcs)
                 func.__kwdefaults__ = rfunc.__kwdefaults__ = {'oper': oper}
 
-            func.__name__ = attr.format('', op)
-            rfunc.__name__ = attr.format('r', op)
-
-            setattr(self, func.__name__, func)
-            setattr(self, rfunc.__name__, rfunc)
+            func.__name__ = name
+            setattr(self, name, func)
+            if rname is not None:
+                rfunc.__name__ = rname
+                setattr(self, rname, rfunc)
 
 class BuiltinMachinery(type):
-    """ Create support for builtin functions as properties.
+    """ Create support for builtin functions as properties. The properties
+        are created by `builtin_property` when first used.
     """
-    builtins = (abs, all, any, ascii, bin, bool, bytearray, bytes, callable,
-                chr, complex, dict, divmod, enumerate, eval, float, format,
-                frozenset, hasattr, hash, hex, id, int, iter, len, list,
-                max, min, next, oct, open, ord, print, range, repr, reversed,
-                round, set, sorted, str, sum, tuple, type, vars, zip,
-                show, show_)
+    builtins = {i.__name__: i for i in
+                (abs, all, any, ascii, bin, bool, bytearray, bytes, callable,
+                 chr, complex, dict, divmod, enumerate, eval, float, format,
+                 frozenset, hasattr, hash, hex, id, int, iter, len, list,
+                 max, min, next, oct, open, ord, print, range, repr, reversed,
+                 round, set, sorted, str, sum, tuple, type, vars, zip,
+                 show, show_)}
+
+    def builtin_property(self, func):
+        """ Property for a builtin function with only one argument. By
+            default, it makes a new object with the function applied to
+            `operand`, like the operators of `OperatorMachinery`.
+        """
+        return property(lambda self: type(self)(func(self.operand)))
 
     def apply_builtins(self, function):
         """ Add attributes for functions with only one argument as properties
         """
-        for i in BuiltinMachinery.builtins:
-            setattr(self, i.__name__, function(i))
+        for name, func in BuiltinMachinery.builtins.items():
+            setattr(self, name, function(func))
+
+    def __getattr__(self, name):
+        try:
+            func = BuiltinMachinery.builtins[name]
+        except KeyError:
+            raise AttributeError(name) from None
+        prop = self.builtin_property(func)
+        setattr(self, name, prop)
+        return prop
 
 class MetaFuncBuilder(OperatorMachinery, BuiltinMachinery):
     """ Add customized operators to class upon initialization and
@@ -209,15 +1388,12 @@ class MetaFuncBuilder(OperatorMachinery, BuiltinMachinery):
         def func(self, *n, oper=NotImplemented):
             """ Wrapper to handle unary, binary or n-ary operations
                 If second other operands are FuncBuilder objects, increase
-                the var_cnt of new object.
+                the var_cnt of new object, unless it has placeholders.
             """
-            name = oper.__name__
-            if n:
-                attr = (n[0] if len(n) == 1 else n)
-            obj = type(self)(lambda x: oper(self.func(x), *n),
-                             (name, attr) if n else name,
-                             self)
-            if n and isinstance(n[0], type(self)):
+            node = (BinOp(self._node, oper, n) if n
+                    else UnaryOp(self._node, oper))
+            obj = type(self)(None, node, self)
+            if n and isinstance(n[0], type(self)) and not obj._params:
                 obj.var_cnt += 1
             return obj
 
@@ -227,12 +1403,12 @@ class MetaFuncBuilder(OperatorMachinery, BuiltinMachinery):
                 as second operand. I.e. `pow(1, obj, 5)` won't work
                 because of limitation of starred assignment
             """
-            return type(self)(lambda x: oper(n, self.func(x)),
-                              (n, oper.__name__),
-                              self)
+            return type(self)(None, BinOp(self._node, oper, (n,), True), self)
 
         self.apply_operators([func, rfunc])
-        self.apply_builtins(function_replacement)
+
+    def builtin_property(self, func):
+        return function_replacement(func)
 
 
 class MetaFuncOperation(OperatorMachinery):
@@ -245,15 +1421,10 @@ class MetaFuncOperation(OperatorMachinery):
             """ Wrapper to call both operands with same arguments.
                 Also works with unary operations
             """
-            if not n:
-                obj = lambda *a, **kw: oper(self(*a, **kw))
-            else:
-                obj = lambda *a, **kw: oper(self(*a, **kw), n[0](*a, **kw))
-            return type(self)(obj)
+            return type(self).combination(oper, (self,) + n)
 
         def rfunc(self, n, *, oper=NotImplemented):
-            return type(self)(lambda *a, **kw:
-                              oper(n(*a, **kw), self(*a, **kw)))
+            return type(self).combination(oper, (n, self))
 
         self.apply_operators([func, rfunc])
         
@@ -273,30 +1444,376 @@ class FuncBuilder(metaclass=MetaFuncBuilder):
 
         Don't iterate a FuncBuilder object because that's really slow
         and it's a infinite iterator!
-    """
 
-    def __init__(self, func=None, op=None, parent=None):
-        self.func = func if func else lambda x: x
-        self.var_cnt = parent.var_cnt if parent else 1
-        self.op = list(parent.op) if parent else []
-        if op is not None:
-            self.op.append(op)
+        Set `auto_compile` on the class (or a subclass) to replace the
+        nested functions by the result of `compile` on the first call.
+        Set `auto_optimize` to simplify the compiled functions with
+        `optimize`, which assumes the arguments are integers.
+
+        Set a `Profiler` as `profiler` to profile the objects created while
+        it is set, except those with placeholders.
+    """
+    __slots__ = ('func', 'var_cnt', '_node', '_compiled', '_params',
+                 '__weakref__')
+
+    auto_compile = False
+    auto_optimize = False
+    profiler = None
+
+    def __init__(self, func=None, node=None, parent=None):
+        """ Objects are created with a function or with the node of the
+            expression. In the latter case, `func` is made by `__getattr__`
+            when first used, so objects only used to build other expressions
+            don't keep any function.
+        """
+        if node is None and func is not None:
+            node = Apply(None, func)
+        self._node = node
+        self._compiled = None
+        if parent is not None:
+            self._params = merge_params(parent._params, params(node))
+        else:
+            self._params = merge_params(*map(params, iter_nodes(node)))
+        # Every `f` of an expression with placeholders is the same argument
+        self.var_cnt = parent.var_cnt if parent and not self._params else 1
+
+        if func is not None or node is None:
+            self.func = func if func else identity
+        elif self.auto_compile or self._params:
+            self.func = self._compile_on_call
+        if (node is not None and self.profiler is not None and
+                not self._params): # Placeholders need `compile`
+            self.func = self._profile_on_call(self.profiler)
+
+    @property
+    def op(self):
+        """ List of operations done by the object
+        """
+        return [op for op in (n.op() for n in shown_nodes(self._node))
+                if op is not None]
 
     def __repr__(self):
         return '<var %s>' % self.op
 
+    def __reduce__(self):
+        """ Pickle the nodes instead of the functions, so the objects can be
+            sent to other processes. The function is compiled again when
+            called.
+
+            >>> import pickle
+            >>> g = pickle.loads(pickle.dumps(f.imag * 2 + 1))
+            >>> g
+            <var [('attr', 'imag'), ('mul', 2), ('add', 1)]>
+            >>> g(3j)
+            7.0
+        """
+        nodes = [(type(n), n.fields()) for n in iter_nodes(self._node)]
+        return rebuild, (type(self), nodes, self.var_cnt)
+
     def __call__(self, *args):
         """ Call the inner function with the first argument, if exists
             Than call the resulting object with other arguments
             (obj + obj)(1, 2) == (obj + obj)(1)(2)
+
+            Expressions with placeholders receive all the arguments at once.
         """
-        if not args:
-            return self.func() #unary operators
+        if not args or self._params:
+            return self.func(*args) #unary operators or placeholders
         
         required, *args = args
         out = self.func(required)
         return out(*args) if args else out
 
+    def _compile_on_call(self, *args):
+        """ Placeholder for `func` while `auto_compile` is active.
+        """
+        self.func = self.compile()
+        return self.func(*args)
+
+    def _profile_on_call(self, profiler):
+        """ Placeholder for `func` when created with a global profiler.
+        """
+        def profile(*args):
+            self.func = profiler.wrap(self._node)
+            return self.func(*args)
+        return profile
+
+    def profiled(self, profiler):
+        """ Expression with each operation profiled by the given `Profiler`
+
+            >>> p = Profiler()
+            >>> g = f.call('strip').int.profiled(p)
+            >>> [g(x) for x in (' 1', '2 ')]
+            [1, 2]
+            >>> [(op, calls) for op, calls, _, _ in p.table()]
+            [(('call', 'strip()'), 2), ('int', 2)]
+        """
+        if self._params:
+            raise TypeError('Expressions with placeholders cannot be profiled')
+        obj = type(self)(profiler.wrap(self._node), self._node)
+        obj.var_cnt = self.var_cnt
+        return obj
+
+    def iterative(self):
+        """ Expression evaluated by a loop over the operations instead of
+            nested calls. The stack depth doesn't grow with the length of
+            the expression, which is always done for more operations than
+            `NESTING_LIMIT`.
+
+            >>> g = f
+            >>> for i in range(5000):
+            ...     g = g + 1
+            >>> g(0), (f.real + 1).iterative()(2)
+            (5000, 3)
+        """
+        if self._params:
+            raise TypeError('Expressions with placeholders are compiled')
+        obj = type(self)(loop_function(list(iter_nodes(self._node))),
+                         self._node)
+        obj.var_cnt = self.var_cnt
+        return obj
+
+    def compile(self):
+        """ Generate a single function doing all the operations, without
+            the nested function calls made by the FuncBuilder object.
+
+            >>> g = (f.real * 2 + 1).compile()
+            >>> g(3 + 4j)
+            7.0
+            >>> sorted(['b ', ' a', 'c'], key=f.call('strip').compile())
+            [' a', 'b ', 'c']
+
+            Placeholders are parameters of the function, after the argument
+            of FuncBuilder objects if it is used:
+
+            >>> (arg('x') * 2 + arg('y')).compile()(y=1, x=3)
+            7
+            >>> (f - arg('y')).compile()(5, 2), (arg('y') - f).compile()(5, 2)
+            (3, -3)
+
+            Parts shared by the operands are computed once:
+
+            >>> class Feature:
+            ...     calls = 0
+            ...     def score(self):
+            ...         Feature.calls += 1
+            ...         return 3
+            >>> base = arg('x').call('score')
+            >>> (base * 2 + base ** 2)(Feature()), Feature.calls
+            (15, 1)
+        """
+        if self._compiled is None:
+            try:
+                structure = Structure(self)
+            except TypeError: # Cached expressions
+                self._compiled = compile_expression(self)
+            else:
+                self._compiled = compile_cache(structure)
+                structure.expr = None
+        return self._compiled
+
+    def fingerprint(self):
+        """ Hashable key of the structure of the expression: equal for
+            expressions built with the same operations and constants (see
+            `value_key`). Raises TypeError for expressions made by `cached`.
+
+            >>> (f.real + 1).fingerprint() == (f.real + 1).fingerprint()
+            True
+            >>> (f + 1).fingerprint() == (f + 1.0).fingerprint()
+            False
+
+            Compiled functions are shared by expressions with the same
+            fingerprint, through the `compile_cache` of the module:
+
+            >>> (f.real * 2).compile() is (f.real * 2).compile()
+            True
+        """
+        return self.var_cnt, tuple(map(node_key, iter_nodes(self._node)))
+
+    def optimize(self, changes=None):
+        """ New object with the operations simplified. Descriptions of
+            the changes are appended to the `changes` list, if given.
+            See `optimize_nodes` for the rules, which are not exact for
+            arguments other than integers.
+
+            >>> changes = []
+            >>> (-(-f) + 1 + 2 - 3).optimize(changes)
+            <var []>
+            >>> changes
+            ["'neg' 'neg' -> []", "('add', 1) ('add', 2) -> [('add', 3)]", "('add', 3) ('sub', 3) -> [('add', 0)]", "('add', 0) -> []"]
+            >>> f.a.b.int.int.c.optimize()
+            <var [('attr', 'a.b'), 'int', ('attr', 'c')]>
+        """
+        node = optimize_nodes(self._node, changes)
+        if node is self._node:
+            return self
+        obj = type(self)(None, node)
+        obj.var_cnt = self.var_cnt
+        return obj
+
+    def native(self):
+        """ The `operator` getter doing the whole expression, for expressions
+            with only `get`, `attr` and `call` that can be done by a single
+            getter (attribute lookups in sequence are merged). It can be used
+            where the FuncBuilder object would be, without its `__call__`.
+
+            >>> f.point.imag.native()
+            operator.attrgetter('point.imag')
+            >>> sorted([(1, 'b'), (2, 'a')], key=f[1].native())
+            [(2, 'a'), (1, 'b')]
+            >>> f.call('strip').native()
+            operator.methodcaller('strip')
+        """
+        funcs = getters(self._node)
+        if self._params or funcs is None or len(funcs) != 1:
+            raise TypeError('%r is not done by a single getter' % (self,))
+        return funcs[0]
+
+    def map(self, iterable):
+        """ Iterator applying the expression to each item, like the builtin
+            `map` with the compiled function. Expressions with only getters
+            are done by `map` with `operator` getters, without Python calls.
+
+            >>> list((f * 2).map([1, 2, 3]))
+            [2, 4, 6]
+            >>> list(f.imag.map([1j, 2j]))
+            [1.0, 2.0]
+        """
+        if self._params:
+            return it.starmap(self.compile(), iterable)
+        funcs = getters(self._node)
+        if funcs is None:
+            return map(self.compile(), iterable)
+        iterable = iter(iterable)
+        for func in funcs:
+            iterable = map(func, iterable)
+        return iterable
+
+    def filter(self, iterable):
+        """ Iterator of items for which the expression is true, like the
+            builtin `filter`.
+
+            >>> list((f % 2).filter(range(6)))
+            [1, 3, 5]
+        """
+        if getters(self._node) is None and not self._params:
+            return filter(self.compile(), iterable)
+        items, values = it.tee(iterable)
+        return it.compress(items, self.map(values))
+
+    def map_chunks(self, iterable, size=1024):
+        """ Generator of lists with the results of `map` for each `size`
+            items of the iterable.
+
+            >>> list((f + 1).map_chunks(range(5), 2))
+            [[1, 2], [3, 4], [5]]
+        """
+        for chunk in chunks(iterable, size):
+            yield list(self.map(chunk))
+
+    def filter_chunks(self, iterable, size=1024):
+        """ Generator of lists with the results of `filter` for each `size`
+            items of the iterable. Lists may be empty.
+
+            >>> list(f.filter_chunks(range(5), 2))
+            [[1], [2, 3], [4]]
+        """
+        for chunk in chunks(iterable, size):
+            yield list(self.filter(chunk))
+
+    def parallel_map(self, iterable, processes=None, chunksize=1):
+        """ List with the expression applied to each item, using a
+            `multiprocessing.Pool` with `processes` workers. The expression
+            is pickled (see `__reduce__`) and compiled again by the workers:
+
+                (f ** 2).parallel_map(range(5), 2)  # [0, 1, 4, 9, 16]
+        """
+        import multiprocessing
+        with multiprocessing.Pool(processes) as pool:
+            return pool.map(self, iterable, chunksize)
+
+    def cached(self, maxsize=128, policy='lru', typed=False):
+        """ Expression caching the results for each argument. The `policy`
+            to remove items when `maxsize` is reached can be 'lru' (least
+            recently used) or 'lfu' (least frequently used). Unhashable
+            arguments are evaluated without the cache.
+
+            >>> g = f.str.call('lower').call('split').len.cached(policy='lfu')
+            >>> [g(x) for x in ['A b', 'a B', 'A b', ['c']]]
+            [2, 2, 2, 1]
+            >>> g.cache_info()
+            CacheInfo(hits=1, misses=2, maxsize=128, currsize=2)
+            >>> (g * 10)('A b')
+            20
+        """
+        node = Cached(None, self, maxsize, policy, typed)
+        obj = type(self)(node.cache, node)
+        obj.var_cnt = self.var_cnt
+        return obj
+
+    def _cache(self):
+        node = self._node
+        while node is not None and not isinstance(node, Cached):
+            node = node.parent
+        if node is None:
+            raise TypeError('Expression is not cached')
+        return node.cache
+
+    def cache_info(self):
+        """ Statistics of the cache of the expression made by `cached`
+        """
+        return self._cache().cache_info()
+
+    def cache_clear(self):
+        """ Remove the results kept by the cache made by `cached`
+        """
+        self._cache().cache_clear()
+
+    def vectorized(self, array, fallback=True):
+        """ Evaluate the expression over a whole numpy array, doing each
+            operation once for the array instead of once per element.
+            Only arithmetic, comparison and `abs` are supported by numpy:
+            other expressions, and those numpy refuses to do (like negative
+            powers of integers), are evaluated for each element if
+            `fallback` is set. Otherwise, they raise TypeError or the error
+            of numpy.
+
+            Vectorized results have the numpy types of the array, not the
+            Python ones of direct calls: integers wrap around on overflow
+            instead of growing. Use an array of `dtype=object` to do the
+            operations with the Python objects.
+
+            >>> import numpy
+            >>> ((f ** 2 - 1) * 3).vectorized(numpy.arange(4))
+            array([-3,  0,  9, 24])
+            >>> (f > 0).if_else(f * 10, 0).vectorized(numpy.array([2, -1]))
+            array([20,  0])
+            >>> (f > 0).if_else('+', '-').vectorized(numpy.array([2, -1]))
+            array(['+', '-'], dtype=object)
+            >>> (f ** 40).vectorized(numpy.arange(4, dtype=object))[3]
+            12157665459056928801
+        """
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError('numpy is required for vectorized evaluation')
+
+        array = numpy.asarray(array)
+        func = vector_function(self._node, numpy)
+        if func is not None:
+            try:
+                return func(array)
+            except (TypeError, ValueError):
+                if not fallback:
+                    raise
+        elif not fallback:
+            node = next(n for n in iter_nodes(self._node)
+                        if n.vector_func(numpy) is None)
+            raise TypeError('operation %r cannot be vectorized' % (node.op(),))
+        # Elements as Python objects, to get the results of direct calls
+        return numpy.vectorize(self.compile(), otypes=[object])(
+            array.astype(object))
+
     def do(self, arg, n=None, cycle=False):
         """ Apply function call with same argument `n` times.
             If `n` is not defined, the internal counter is used.
@@ -321,7 +1838,7 @@ class FuncBuilder(metaclass=MetaFuncBuilder):
             obj[1] == obj.get(1)
             obj.get(1,2,3)
         """
-        return operator.itemgetter(*args), ('get', args)
+        return Item(self._node, args)
 
     @function
     def attr(self, name):
@@ -329,42 +1846,86 @@ class FuncBuilder(metaclass=MetaFuncBuilder):
             on __getattr__ of missing attributes.
             obj.attr('x') == obj.x
         """
-        return operator.attrgetter(name), ('attr', name)
-    __getattr__ = attr
+        return Attr(self._node, name)
+
+    def __getattr__(self, name):
+        """ Builtin functions as properties (see `BuiltinMachinery`) or
+            `attr` for other names. Also creates `func` on first use.
+        """
+        if name == 'func':
+            self.func = node_function(self._node)
+            return self.func
+        if name in BuiltinMachinery.builtins:
+            return getattr(type(self), name).__get__(self)
+        return self.attr(name)
 
     @function
     def call(self, name, *args, **kw):
         """ Used to call a method inside the object.
             obj.call('strip', '-')('--hai--') -> hai
         """
-        return (operator.methodcaller(name, *args, **kw),
-                ('call', '{0}{1}{2}'.format(name, args, kw if kw else '')))
+        return Call(self._node, name, args, kw)
 
-    @function_final
+    @function
     def count(self, arg):
         """ Return a counter of some argument inside a sequence.
         """
-        return lambda x: operator.countOf(self(x), arg), ('count', arg)
+        return Count(self._node, arg)
 
-    @function_final
+    @function
     def has(self, arg):
         """ Check if a sequence contains an argument.
             The `in` operator must return a boolean object so it will not
             work with this class. Use  `obj.has(x)` instead of `x in obj`
         """
-        return lambda x: operator.contains(self(x), arg), ('has', arg)
+        return Has(self._node, arg)
+
+    @function
+    def if_else(self, then, other=None):
+        """ `then` where the expression is true for the argument and `other`
+            where it is false. Like the other lazy combinators, FuncBuilder
+            operands are evaluated with the argument only when needed and
+            other values are used as they are:
+
+            >>> sign = (f > 0).if_else('+', (f < 0).if_else('-', '0'))
+            >>> [sign(x) for x in (3, -1, 0)]
+            ['+', '-', '0']
+        """
+        return IfElse(None, self, then, other)
 
+    @function
+    def and_then(self, other):
+        """ `self(x) and other(x)`, unlike `&`, which computes both sides
 
-class BaseCallable:
-    """ Provide a simple interface to hold a callable object
-    """
-    def __init__(self, function=None):
-        self.func = function if function is not None else lambda x: x
-    def __call__(self, *args, **kwargs):
-        return self.func(*args, **kwargs)
+            >>> first = f.and_then(f[0])
+            >>> first(''), first('abc')
+            ('', 'a')
+        """
+        return AndThen(None, self, other)
+
+    @function
+    def or_else(self, other):
+        """ `self(x) or other(x)`
+
+            >>> label = f.call('strip').or_else('empty')
+            >>> label('  '), label(' a ')
+            ('empty', 'a')
+        """
+        return OrElse(None, self, other)
+
+    @function
+    def coalesce(self, *others):
+        """ First result that is not None, trying the expression and then
+            each of the others.
+
+            >>> name = f.call('get', 'nick').coalesce(f.call('get', 'name'), '?')
+            >>> [name(d) for d in ({'nick': 'jb'}, {'name': 'João'}, {})]
+            ['jb', 'João', '?']
+        """
+        return Coalesce(None, self, *others)
 
 
-class FuncOperation(BaseCallable, metaclass=MetaFuncOperation):
+class FuncOperation(metaclass=MetaFuncOperation):
     """ Work with operators to build functions of functions:
         Should be applied as decorator to some function and this function
         will build other FuncOperation objects when with other functions or
@@ -386,8 +1947,59 @@ class FuncOperation(BaseCallable, metaclass=MetaFuncOperation):
         Thought this class is not expected to work with FuncBuilder objects
         as second operand, because it will treat the FuncOperation object
         as a value.
+
+        Objects built with operators keep the tree of operations and
+        compile it to a single function when first called. Each function
+        in the tree is called once, with the same arguments, even if it is
+        used many times (see `impure` for the exceptions):
+
+        >>> calls = []
+        >>> def feature(x):
+        ...     calls.append(x)
+        ...     return x * 2
+        >>> score = (fop(feature) + fop(abs)) * -fop(feature)
+        >>> score(-3), calls
+        (-18, [-3])
     """
-    pass #all done on Meta and Base classes
+    operation = None # (operator, operands) when built with an operator
+
+    def __init__(self, function=None):
+        if isinstance(function, FuncOperation):
+            self.operation = function.operation
+            if function.operation is None:
+                self.func = function.func
+        else:
+            self.func = function if function is not None else identity
+
+    @classmethod
+    def combination(cls, oper, operands):
+        """ New object applying `oper` to the results of the operands.
+            The function is created when first used.
+        """
+        obj = cls.__new__(cls)
+        obj.operation = oper, operands
+        return obj
+
+    def __getattr__(self, name):
+        if name == 'func' and self.operation is not None:
+            self.func = operation_function(self)
+            return self.func
+        raise AttributeError(name)
+
+    def __call__(self, *args, **kw):
+        return self.func(*args, **kw)
+
+    def __reduce__(self):
+        """ Pickle the operator and the operands, which must be picklable
+            themselves (e.g. functions defined at module level).
+
+            >>> import pickle
+            >>> pickle.loads(pickle.dumps(fop(abs) * fop(abs)))(-3)
+            9
+        """
+        if self.operation is None:
+            return type(self), (self.func,)
+        return self.operation
 
 
 ###############################################################################
@@ -396,6 +2008,25 @@ class FuncOperation(BaseCallable, metaclass=MetaFuncOperation):
 f = FuncBuilder()
 fop = FuncOperation # shortcut
 
+def arg(name):
+    """ Placeholder for an argument of a function with many arguments.
+        Unlike `f + f`, the arguments are given to a single call and every
+        placeholder with the same name has the same value.
+
+        >>> g = arg('x') * 2 + arg('y') - arg('x')
+        >>> g(10, 1)
+        11
+        >>> list(g.map([(1, 2), (3, 4)]))
+        [3, 7]
+        >>> import functools
+        >>> functools.reduce((arg('acc') * 10 + arg('item')).compile(), [1, 2, 3])
+        123
+    """
+    if (not isinstance(name, str) or not name.isidentifier() or
+            keyword.iskeyword(name) or name.startswith('_')):
+        raise ValueError('Invalid placeholder name: %r' % (name,))
+    return FuncBuilder(None, Arg(None, name))
+
 #Run doctest from module
 if __name__ == "__main__":
     import doctest
@@ -0,0 +1,98 @@
+"""
+    Caches of functions of one argument, used by `FuncBuilder.cached` and
+    by the compile cache of funcbuilder.
+"""
+import collections
+import functools
+import threading
+
+__all__ = 'Cache', 'LFUCache'
+
+CacheInfo = collections.namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+class LFUCache:
+    """ Least frequently used cache for a function of one argument, with the
+        interface of `functools.lru_cache`. Between values used the same
+        number of times, the least recently used is removed first.
+    """
+    def __init__(self, func, maxsize=128, typed=False):
+        self.func = func
+        self.maxsize = maxsize
+        self.typed = typed
+        self.lock = threading.Lock()
+        self.cache_clear()
+
+    def cache_clear(self):
+        with self.lock:
+            self.data = {} # key: [value, count]
+            self.counts = collections.defaultdict(collections.OrderedDict)
+            self.min_count = 0
+            self.hits = self.misses = 0
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.data))
+
+    def __call__(self, x):
+        key = (x, type(x)) if self.typed else x
+        with self.lock:
+            item = self.data.get(key)
+            if item is not None:
+                self.hits += 1
+                self.use(key, item)
+                return item[0]
+            self.misses += 1
+
+        value = self.func(x)
+        with self.lock:
+            if key in self.data or self.maxsize == 0:
+                return value
+            if self.maxsize is not None and len(self.data) >= self.maxsize:
+                self.evict()
+            self.data[key] = [value, 1]
+            self.counts[1][key] = None
+            self.min_count = 1
+        return value
+
+    def use(self, key, item):
+        """ Move the key to the next count
+        """
+        count = item[1]
+        keys = self.counts[count]
+        del keys[key]
+        if not keys:
+            del self.counts[count]
+            if self.min_count == count:
+                self.min_count += 1
+        item[1] = count + 1
+        self.counts[count + 1][key] = None
+
+    def evict(self):
+        keys = self.counts[self.min_count]
+        key, _ = keys.popitem(last=False)
+        if not keys:
+            del self.counts[self.min_count]
+        del self.data[key]
+
+
+class Cache:
+    """ Cache of a function of one argument with `lru` or `lfu` policy.
+        Unhashable arguments are not cached.
+    """
+    policies = {'lru': lambda func, maxsize, typed:
+                           functools.lru_cache(maxsize, typed)(func),
+                'lfu': LFUCache}
+
+    def __init__(self, func, maxsize=128, policy='lru', typed=False):
+        if policy not in self.policies:
+            raise ValueError('Unknown cache policy: %r' % (policy,))
+        self.func = func
+        self.cached = self.policies[policy](func, maxsize, typed)
+        self.cache_info = self.cached.cache_info
+        self.cache_clear = self.cached.cache_clear
+
+    def __call__(self, x):
+        try:
+            hash(x)
+        except TypeError:
+            return self.func(x)
+        return self.cached(x)
@@ -0,0 +1,64 @@
+"""
+    Profiling of the operations of FuncBuilder expressions, see
+    `FuncBuilder.profiled` and `FuncBuilder.profiler`.
+"""
+import time
+
+import funcbuilder
+
+__all__ = 'Profiler',
+
+class Profiler:
+    """ Count the calls and the time spent by each operation of profiled
+        expressions. Operations shared by many expressions are counted
+        together. If given, `hook(op, elapsed)` is called after each
+        operation, e.g. to send the data to other tools.
+
+        Expressions are profiled with `FuncBuilder.profiled` or, setting
+        a profiler as `FuncBuilder.profiler`, every object created after
+        that. Objects created without a profiler are not changed, and
+        expressions with placeholders are never profiled.
+    """
+    def __init__(self, hook=None, timer=time.perf_counter):
+        self.hook = hook
+        self.timer = timer
+        self.stats = {} # node: [calls, time]
+
+    def clear(self):
+        self.stats.clear()
+
+    def wrap(self, node):
+        """ Function evaluating the operations one by one with timing
+        """
+        steps = [(n.op(), funcbuilder.step_function(n),
+                  self.stats.setdefault(n, [0, 0.0]))
+                 for n in funcbuilder.iter_nodes(node)]
+        timer, hook = self.timer, self.hook
+
+        def profiled(x):
+            for op, func, stat in steps:
+                start = timer()
+                x = func(x)
+                elapsed = timer() - start
+                stat[0] += 1
+                stat[1] += elapsed
+                if hook is not None:
+                    hook(op, elapsed)
+            return x
+        return profiled
+
+    def table(self):
+        """ List of (op, calls, time, fraction of the total time)
+        """
+        total = sum(t for _, t in self.stats.values()) or 1
+        return [(n.op(), calls, t, t / total)
+                for n, (calls, t) in self.stats.items()]
+
+    def report(self):
+        """ The table as text, slowest operations first
+        """
+        lines = ['%-40s %10s %12s %7s' % ('op', 'calls', 'time', '%')]
+        for op, calls, t, part in sorted(self.table(), key=lambda x: -x[2]):
+            lines.append('%-40s %10d %11.6fs %6.1f%%'
+                         % (repr(op)[:40], calls, t, part * 100))
+        return '\n'.join(lines)
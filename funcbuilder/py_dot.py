@@ -7,7 +7,9 @@ Author: João Bernardo Oliveira - @jbvsmo
 
 import functools
 import itertools
+import keyword
 import re
+import types
 
 import funcbuilder
 
@@ -57,42 +59,87 @@ class Code(Repr):
         yield self.data
 
 
-class CodeIter:
-    def __init__(self, code):
-        self.code = InsertIter(code)
-        self.loop = None
-    
-    def __iter__(self):
-        while True:
-            try:
-                for loop in self.loop:
-                    for obj in loop:
-                        yield iter(obj)
+# Opcodes of the instructions run by `Function`. Instructions are tuples
+# `(opcode, arg, target)` where `target` is the index of the instruction
+# to jump to, when used.
+UPDATE, RETURN, JUMP, JUMP_IF_FALSE, GET_ITER, FOR_ITER = range(6)
 
-            except TypeError:
-                self.loop = None
 
-            yield next(self.code)
+def assemble(code, evaluate, program=None):
+    """ Flat list of instructions doing a list of Code. Conditions and
+        loops become jumps, so running the code doesn't create objects.
+        Expressions are replaced by `evaluate(expr)`, a function of the
+        frame computing them.
+    """
+    if program is None:
+        program = []
+    for opc, data in code:
+        if opc == 'update':
+            items = tuple(frame_target(name) + (evaluate(value),)
+                          for name, value in data.items())
+            program.append((UPDATE, items, None))
+        elif opc == 'push':
+            program.append((RETURN, evaluate(data), None))
+        elif opc == 'ret':
+            pass # Done by the `push` before it
+        elif opc == 'condition':
+            jumps = []
+            for expr, block in zip(data.expr_if, data.code_if):
+                test = len(program)
+                program.append(None)
+                assemble(block, evaluate, program)
+                jumps.append(len(program))
+                program.append(None)
+                program[test] = (JUMP_IF_FALSE, evaluate(expr), len(program))
+            assemble(data.code_else, evaluate, program)
+            for i in jumps:
+                program[i] = (JUMP, None, len(program))
+        elif opc == 'loop':
+            name, value = next(iter(data.data.items()))
+            program.append((GET_ITER, evaluate(value), None))
+            start = len(program)
+            program.append(None)
+            assemble(data.code, evaluate, program)
+            program.append((JUMP, None, start))
+            program[start] = (FOR_ITER, frame_target(name), len(program))
+        else:
+            raise ValueError('Unknown opcode: %s' % opc)
+    return program
 
-    def insert(self, code):
-        self.code.insert(code)
 
-    def create_loop(self, loop):
-        self.loop = loop
+def run_update(frame, items, target, pc, iterators):
+    if len(items) == 1:
+        (obj, names, value), = items
+        store(frame, obj, names, value(frame))
+        return pc + 1
+    # Every value is computed before setting the names
+    values = [value(frame) for _, _, value in items]
+    for (obj, names, _), value in zip(items, values):
+        store(frame, obj, names, value)
+    return pc + 1
 
+def run_jump(frame, arg, target, pc, iterators):
+    return target
 
-class InsertIter:
-    def __init__(self, seq):
-        self.seq = iter(seq)
+def run_jump_if_false(frame, expr, target, pc, iterators):
+    return pc + 1 if expr(frame) else target
 
-    def insert(self, seq):
-        self.seq = itertools.chain(seq, self.seq)
+def run_get_iter(frame, value, target, pc, iterators):
+    iterators.append(iter(value(frame)))
+    return pc + 1
 
-    def __iter__(self):
-        return self
+def run_for_iter(frame, path, target, pc, iterators):
+    for item in iterators[-1]:
+        store(frame, *path, item)
+        return pc + 1
+    iterators.pop()
+    return target
+
+# Functions running each opcode and returning the next instruction. RETURN
+# is done by `Function.run`.
+DISPATCH = {UPDATE: run_update, JUMP: run_jump, JUMP_IF_FALSE: run_jump_if_false,
+            GET_ITER: run_get_iter, FOR_ITER: run_for_iter}
 
-    def __next__(self):
-        return next(self.seq)
 
 ###########################################################################
 #   Fixing things to allow function call evaluation
@@ -130,6 +177,12 @@ def fix_self(args, kw=None):
     return args
 
 
+def fix_names(names):
+    """ Names of arguments as given by the user, with `self` for `$`
+    """
+    return ['self' if x == '$' else x for x in names]
+
+
 ###########################################################################
 #   Functions, Loops, Conditions
 ###########################################################################
@@ -168,6 +221,9 @@ class Function(Repr):
         execution (i.e. name binding) is *always* in the local environment!
     """
     _repr_args = 'name', 'args', 'code'
+
+    # Compile the functions to Python code at `end`, see `compile`
+    auto_compile = False
     
     def __init__(self, name, *args, unpack=None, environ=None):
         """ Unpack is a poor-man copy of the unpacking ability from Py2k
@@ -187,45 +243,86 @@ class Function(Repr):
         self.args = fix_self(args)
         self.unpack = unpack
         self.code = []
+        self.program = self.frame_class = None # Made by `prepare`
+        self.native = None
 
     def __call__(self, *args, **kw):
-        args = fix_self(args, kw)
+        if self.native is not None:
+            if kw:
+                args = self.bind_keywords(args, kw)
+            return self.native(*args)
+
+        frame_class = self.frame_class or self.prepare()
+        if kw:
+            args = self.bind_keywords(args, kw)
+        elif len(args) != self.arity:
+            raise TypeError('Expected %s arguments, got %s'
+                            % (self.arity, len(args)))
+        return self.run(frame_class(*args))
+
+    def prepare(self):
+        """ Assemble the instructions of the function and resolve the slots
+            of its local names, on the first call. Returns the frame class.
+        """
+        self.program = assemble(self.code, FrameCompiler(self).evaluator)
+        self.loops = any(opcode == GET_ITER for opcode, _, _ in self.program)
+        self.arity = len(self.args) + (self.unpack is not None)
+        self.frame_class = frame_class(self)
+        return self.frame_class
+
+    def run(self, frame):
+        """ Interpret the instructions of the function in a frame made by
+            `prepare`
+        """
+        program = self.program
+        dispatch = DISPATCH
+        iterators = [] if self.loops else None
+        pc, end = 0, len(program)
+        while pc < end:
+            opcode, arg, target = program[pc]
+            if opcode == RETURN:
+                return arg(frame)
+            pc = dispatch[opcode](frame, arg, target, pc, iterators)
+        return None
 
-        e = Environment().set(__parent__ = self.environ)
+    def bind_keywords(self, args, kw):
+        """ Positional arguments of the compiled function
+        """
+        fix_self((), kw)
         if self.unpack is not None:
+            if not args:
+                raise TypeError('Expected the values to unpack as the last '
+                                'positional argument')
             *args, unpack_args = args
-            
-            lsu, lu = len(self.unpack), len(unpack_args)
-            if lsu != lu:
-                raise TypeError('Expected %s values to unpack, got %s' % (lsu, lu))
-            
-            e.set(**dict(zip(self.unpack, unpack_args)))
-
-        la, lsa = len(args), len(self.args)
-        la += len(kw)
-        if lsa != la:
-            raise TypeError('Expected %s arguments, got %s' % (lsa, la))
-
-        e.set(**dict(zip(self.args, args)))
-        e.set(**kw)
-        
-        stack = []
-        code = CodeIter(self.code)
-        for opc, data in code:
-            if opc == 'update':
-                e.set(**{k: calculate(v, e) for k, v in data.items()})
-            elif opc == 'push':
-                stack.append(calculate(data, e))
-            elif opc == 'ret':
-                return stack.pop()
-            elif opc == 'condition':
-                code.insert(data.code_to_exec(e))
-            elif opc == 'loop':
-                code.create_loop(data.block_to_exec(e))
-            else:
-                raise ValueError('Unknown opcode: %s' % opc)
-
-        return None
+        args = list(args)
+        given = self.args[:len(args)]
+        for name in self.args[len(args):]:
+            if name not in kw:
+                break
+            args.append(kw.pop(name))
+        unknown = [name for name in kw if name not in self.args]
+        if unknown:
+            raise TypeError('Unexpected keyword arguments: %s'
+                            % ', '.join(map(repr, fix_names(unknown))))
+        repeated = [name for name in kw if name in given]
+        if repeated:
+            raise TypeError('Multiple values for arguments: %s'
+                            % ', '.join(map(repr, fix_names(repeated))))
+        if kw or len(args) != len(self.args):
+            raise TypeError('Expected %s arguments, got %s'
+                            % (len(self.args), len(args) + len(kw)))
+        if self.unpack is not None:
+            args.append(unpack_args)
+        return args
+
+    def compile(self):
+        """ Replace the interpreter by a Python function doing the same
+            code, made by `FunctionCompiler`. Done by `end` when the
+            `auto_compile` class attribute is set, keeping the interpreter
+            for functions that can't be compiled.
+        """
+        self.native = FunctionCompiler(self).compile()
+        return self
 
     def call(self, *args, **kw):
         """ Semi-deprecated function to call a function and save the value in the parent.
@@ -238,6 +335,7 @@ class Function(Repr):
             The right side can be made of expressions using `var`.
         """
         self.code.append(Code('update', kw))
+        self.changed()
         return self
 
     def ret(self, expr):
@@ -245,6 +343,7 @@ class Function(Repr):
         """
         self.code.append(Code('push', expr))
         self.code.append(Code('ret'))
+        self.changed()
         return self
 
     def if_(self, expr):
@@ -252,6 +351,7 @@ class Function(Repr):
         """
         cond = Condition(expr, self)
         self.code.append(Code('condition', cond))
+        self.changed()
         return cond
 
     def for_(self, **kw):
@@ -259,12 +359,27 @@ class Function(Repr):
         """
         loop = Loop(kw, self)
         self.code.append(Code('loop', loop))
+        self.changed()
         return loop
 
+    def changed(self):
+        """ Forget what was made from the code, which is being changed: the
+            instructions, the frame class and the compiled function. Blocks
+            of conditions and loops change the function having them.
+        """
+        self.program = self.frame_class = self.native = None
+        if isinstance(self.parent, Function):
+            self.parent.changed()
+
     @property
     def end(self):
         """ Go back to parent if any or self.
         """
+        if self.auto_compile:
+            try:
+                self.compile()
+            except TypeError:
+                pass
         return self.parent if self.parent is not None else self
 
     def __get__(self, instance, owner):
@@ -272,7 +387,7 @@ class Function(Repr):
         """
         if instance is None:
             return self
-        return functools.partial(self, instance)
+        return types.MethodType(self, instance)
 
 
 class Lambda(Function):
@@ -291,6 +406,7 @@ class Condition(Function):
         This is just a function, so any function stuff can be used.
     """
     _repr_args = 'name',
+    auto_compile = False # Compiled with the function
 
     def __init__(self, expression, parent):
         super().__init__('if-elif-else')
@@ -309,6 +425,7 @@ class Condition(Function):
         self.code = code
         self.code_if.append(code)
         self.expr_if.append(expr)
+        self.changed()
         return self
 
     @property
@@ -319,13 +436,6 @@ class Condition(Function):
         self.code = self.code_else
         return self
 
-    def code_to_exec(self, environ):
-        self.environ = environ
-        for expr, code in zip(self.expr_if, self.code_if):
-            if calculate(expr, environ):
-                return code
-        return self.code_else
-
     @property
     def end(self):
         self.code = [] # The block should not be executed
@@ -344,50 +454,28 @@ class Loop(Function):
 
         Note that iterators provided in declaration time may only work the first time used!
     """
+    auto_compile = False # Compiled with the function
+
     def __init__(self, data, parent):
         super().__init__('for')
         self.parent = parent
         self.data = data
 
-    def block_to_exec(self, environ):
-        name, value = next(iter(self.data.items()))
-        value = calculate(value, environ)
-        return LoopIter(name, value, self.code)
-
-
-class LoopIter:
-    """ Get the next item from iterator and repeat the Loop code
-    """
-    def __init__(self, name, value, code):
-        self.name = name
-        self.iterator = iter(value)
-        self.code = code
-
-    def __iter__(self):
-        return self
-
-    def __next__(self):
-        set_name = [Code('update', {self.name: next(self.iterator)})]
-        return itertools.chain(set_name, self.code)
-
 
 ###########################################################################
 #    The real_attribute functionality
 ###########################################################################
 
-def real_attribute(dic, attr, value=None, do_set=False):
-    """
-        Set attributes in django-like keyword style to a dictionary object
-        # set = some_environment.set
-        >>> set(a = 1)         # dic['a'] = 1
-        >>> set(_a = 1)        # dic['_a'] = 1
-        >>> set(a__b = 1)      # dic['a'].b = 1
-        >>> set(a__b___c = 1)  # dic['a'].b._c = 1
-        >>> set(_a__b = 1)     # dic['_a'].b = 1
-        >>> set(__foo__ = 1)   # dic['__foo__'] = 1
+@functools.lru_cache(maxsize=4096)
+def attribute_path(attr):
+    """ Split a name in the `real_attribute` syntax in the key of the
+        dictionary and the attributes to get from it. Names are parsed once
+        and the result is cached:
 
-        # Would be an invalid attribute name otherwise. Same bypass of `__foo__`:
-        >>> set(__f__o__o__ = 1)   # dic['__f__o__o__'] = 1
+        >>> attribute_path('a__b___c')
+        ('a', ('b', '_c'))
+        >>> attribute_path('__foo__')
+        ('__foo__', ())
     """
     if attr == 'self':
         attr = '$'
@@ -395,41 +483,440 @@ def real_attribute(dic, attr, value=None, do_set=False):
 
     # For "__cases__", "cases", and self as "$"
     if attr == '$' or (names[0].startswith('__') and names[-1] == '__') or len(names) == 1:
-        if do_set:
-            dic[attr] = value  #special names will not be checked! E.g.: __init__
-            return
-        else:
-            return dic[attr]
+        return attr, ()
 
     obj, *names = names
 
     if obj == 'self':
         obj = '$'
-    obj = dic[obj]
 
     fixed_names = []
     it = iter(names)
 
     for x in it:
-        name = re.sub(r'^__', '', x)
+        name = x[2:] if x.startswith('__') else x
 
         # "a___b" is parsed as ['a', '_', '__b'] and results in "a._b"
         while x == '_':
             x = next(it)
-            name += re.sub(r'^__', '', x)
+            name += x[2:] if x.startswith('__') else x
 
         fixed_names.append(name)
 
-    *getters, setter = fixed_names
+    return obj, tuple(fixed_names)
+
 
-    obj_to_handle = obj
-    for name in getters:
-        obj_to_handle = getattr(obj_to_handle, name)
+def real_attribute(dic, attr, value=None, do_set=False):
+    """
+        Set attributes in django-like keyword style to a dictionary object
+        # set = some_environment.set
+        >>> set(a = 1)         # dic['a'] = 1
+        >>> set(_a = 1)        # dic['_a'] = 1
+        >>> set(a__b = 1)      # dic['a'].b = 1
+        >>> set(a__b___c = 1)  # dic['a'].b._c = 1
+        >>> set(_a__b = 1)     # dic['_a'].b = 1
+        >>> set(__foo__ = 1)   # dic['__foo__'] = 1
 
+        # Would be an invalid attribute name otherwise. Same bypass of `__foo__`:
+        >>> set(__f__o__o__ = 1)   # dic['__f__o__o__'] = 1
+    """
     if do_set:
-        setattr(obj_to_handle, setter, value)
+        set_path(dic, *attribute_path(attr), value)
     else:
-        return getattr(obj_to_handle, setter)
+        return get_path(dic, *attribute_path(attr))
+
+
+def get_path(dic, obj, names):
+    """ `dic[obj]` and then the attributes in `names`
+    """
+    value = dic[obj]
+    for name in names:
+        value = getattr(value, name)
+    return value
+
+
+def set_path(dic, obj, names, value):
+    """ Set `dic[obj]` or its attribute given by `names`
+    """
+    if not names:
+        dic[obj] = value  #special names will not be checked! E.g.: __init__
+    else:
+        setattr(get_path(dic, obj, names[:-1]), names[-1], value)
+
+
+def lookup(environ, obj):
+    """ Value of the name `obj` in an environment or the closest of its
+        parents having it
+    """
+    while environ is not None:
+        d = environ.d
+        if obj in d:
+            return d[obj]
+        environ = d.get('__parent__')
+    raise AttributeError(obj)
+
+
+###########################################################################
+#   Frames of local variables
+###########################################################################
+
+def local_names(code):
+    """ Generator of the names bound by a block of code (`set` and `for_`
+        without attributes), in the nested blocks too
+    """
+    for opc, data in code:
+        if opc == 'update':
+            targets = list(data)
+        elif opc == 'loop':
+            targets = list(data.data)[:1]
+            yield from local_names(data.code)
+        elif opc == 'condition':
+            targets = []
+            for block in data.code_if + [data.code_else]:
+                yield from local_names(block)
+        else:
+            continue
+        for target in targets:
+            name, path = attribute_path(target)
+            if not path:
+                yield name
+
+
+def slot_name(name):
+    """ Attribute of the frames keeping a local name
+    """
+    return 'self' if name == '$' else name
+
+
+def frame_target(name):
+    """ Slot and attributes to set for a name in the `real_attribute` syntax
+    """
+    obj, names = attribute_path(name)
+    return slot_name(obj), names
+
+
+def store(frame, obj, names, value):
+    """ Set the slot `obj` of a frame or its attribute given by `names`
+    """
+    if names:
+        frame = getattr(frame, obj)
+        for name in names[:-1]:
+            frame = getattr(frame, name)
+        obj = names[-1]
+    setattr(frame, obj, value)
+
+
+class Frame:
+    """ Local variables of a running Function. Each function has a subclass
+        made by `frame_class`, with a slot for every name the function binds,
+        so they are read and written as attributes without a dictionary.
+
+        Other names are found in the environment of the function, and so
+        are locals read before being set, like py_dot always did.
+    """
+    __slots__ = '__dict__', # Locals that can't be slots, like `__foo__`
+    __environ__ = None
+
+    def __getattr__(self, name):
+        obj, names = attribute_path(name)
+        if names:
+            value = getattr(self, slot_name(obj))
+        else:
+            value = lookup(self.__environ__, obj)
+        for name in names:
+            value = getattr(value, name)
+        return value
+
+
+def frame_class(function):
+    """ Frame subclass with the local names of a function as slots. Its
+        `__init__` takes the positional arguments of a call, so a frame is
+        made and filled by one call of the class.
+    """
+    names = [slot_name(name) for name in function.args]
+    names += function.unpack or ()
+    names += map(slot_name, local_names(function.code))
+    # Names starting with `__` would be mangled by the class
+    slots = tuple(name for name in dict.fromkeys(names)
+                  if name.isidentifier() and not name.startswith('__'))
+    namespace = {'__slots__': slots, '__environ__': function.environ,
+                 '__init__': frame_init(function, slots)}
+    return type('Frame', (Frame,), namespace)
+
+
+def frame_init(function, slots):
+    """ Python function setting the arguments of a call in a frame
+    """
+    params, lines = [], []
+
+    def assign(name, value):
+        obj, names = frame_target(name)
+        if obj in slots and not names and is_name(obj):
+            lines.append('    self.%s = %s' % (obj, value))
+        else:
+            lines.append('    _store(self, %r, %r, %s)' % (obj, names, value))
+
+    for i, name in enumerate(function.args):
+        params.append('_a%d' % i)
+        assign(name, params[-1])
+    if function.unpack is not None:
+        params.append('_u')
+        lines.append('    if len(_u) != %d:' % len(function.unpack))
+        lines.append('        raise TypeError("Expected %d values to unpack, '
+                     'got %%s" %% len(_u))' % len(function.unpack))
+        for i, name in enumerate(function.unpack):
+            assign(name, '_u[%d]' % i)
+    source = 'def __init__(self, %s):\n%s\n' % (', '.join(params),
+                                                '\n'.join(lines) or '    pass')
+    namespace = {'_store': store}
+    exec(source, namespace)
+    return namespace['__init__']
+
+
+###########################################################################
+#   Compiling functions to Python code
+###########################################################################
+
+# Operations of `var` expressions supported by the compiler
+COMPILED_NODES = (funcbuilder.Attr, funcbuilder.Item, funcbuilder.Call,
+                  funcbuilder.Builtin, funcbuilder.UnaryOp, funcbuilder.BinOp,
+                  funcbuilder.Count)
+
+
+def is_name(name):
+    """ Check if `name` can be written in Python code, e.g. `obj.name`
+    """
+    return name.isidentifier() and not keyword.iskeyword(name)
+
+
+def attribute_code(code, name):
+    """ Code getting the attribute `name` of the result of `code`
+    """
+    if is_name(name):
+        return '%s.%s' % (code, name)
+    return '_getattr(%s, %r)' % (code, name)
+
+
+class FunctionCompiler:
+    """ Generate a Python function doing the code of a Function.
+
+        Names bound by the function (arguments, `set` and `for_` without
+        attributes) are local variables and the others are looked up in the
+        environment of the function at each use, like CPython does for
+        globals. The interpreter reads a local name from the environment
+        until it is set, so functions that may use a local before setting
+        it (e.g. `set(a = var.a * 2)` or a name set in one branch of an
+        `if_` only) raise TypeError.
+
+        Expressions must start with a name and may use operators, builtins,
+        indexes and method calls. Anything else raises TypeError.
+    """
+    def __init__(self, function):
+        self.function = function
+        environ = function.environ
+        if environ is None:
+            environ = Environment()
+        # Builtins have private names, which locals never use
+        self.namespace = {'_e': environ, '_lookup': lookup,
+                          '_getattr': getattr, '_setattr': setattr,
+                          '_len': len, '_TypeError': TypeError}
+        self.lines = []
+        self.names = itertools.count()
+        self.locals = {} # name: Python variable
+        self.assigned = set() # local names surely set at this point
+
+    def local(self, name):
+        """ Python variable of a local name
+        """
+        if name not in self.locals:
+            if name == '$':
+                self.locals[name] = 'self'
+            elif is_name(name) and not name.startswith('_'):
+                self.locals[name] = name
+            else:
+                self.locals[name] = '_l%d' % next(self.names)
+        return self.locals[name]
+
+    def bind(self, code):
+        """ Find the local names set by a block of code
+        """
+        for name in local_names(code):
+            self.local(name)
+
+    def const(self, value):
+        if type(value) in (bool, int, str, type(None)):
+            return repr(value)
+        name = '_c%d' % next(self.names)
+        self.namespace[name] = value
+        return name
+
+    def name(self, name, path=()):
+        """ Code reading a name with attributes
+        """
+        if name in self.locals:
+            if name not in self.assigned:
+                raise TypeError('Local name %r may be used before it is set'
+                                % name)
+            code = self.locals[name]
+        else:
+            code = '_lookup(_e, %r)' % name
+        for attr in path:
+            code = attribute_code(code, attr)
+        return code
+
+    def expr(self, data):
+        """ Code evaluating a `var` expression or a value
+        """
+        if not isinstance(data, funcbuilder.FuncBuilder):
+            return self.const(data)
+        nodes = list(funcbuilder.iter_nodes(data._node))
+        if (not nodes or type(nodes[0]) is not funcbuilder.Attr or
+                '.' in nodes[0].name):
+            raise TypeError('Expression must start with a name: %r' % data)
+
+        code = self.name(*attribute_path(nodes[0].name))
+        for n in nodes[1:]:
+            if not isinstance(n, COMPILED_NODES):
+                raise TypeError('Operation cannot be compiled: %r' % (n.op(),))
+            template, consts = n.step()
+            operands = isinstance(n, funcbuilder.BinOp)
+            names = []
+            for c in consts:
+                if not isinstance(c, funcbuilder.FuncBuilder):
+                    names.append(self.const(c))
+                elif operands:
+                    names.append(self.expr(c))
+                else:
+                    raise TypeError('FuncBuilder objects can only be '
+                                    'operands: %r' % (n.op(),))
+            code = '(%s)' % template.format(*names, x=code)
+        return code
+
+    def assign(self, target, code, indent):
+        name, path = attribute_path(target)
+        if not path:
+            self.line(indent, '%s = %s' % (self.local(name), code))
+            self.assigned.add(name)
+            return
+        *getters, setter = path
+        obj = self.name(name, getters)
+        if is_name(setter):
+            self.line(indent, '%s.%s = %s' % (obj, setter, code))
+        else:
+            self.line(indent, '_setattr(%s, %r, %s)' % (obj, setter, code))
+
+    def line(self, indent, code):
+        self.lines.append('    ' * indent + code)
+
+    def block(self, code, indent):
+        """ Add the lines doing a list of Code. Returns True if the block
+            always returns.
+        """
+        start = len(self.lines)
+        value = None
+        returns = False
+        for opc, data in code:
+            if opc == 'update':
+                if len(data) == 1:
+                    (target, expr), = data.items()
+                    self.assign(target, self.expr(expr), indent)
+                    continue
+                # Every value is computed before setting the names
+                temps = []
+                for expr in data.values():
+                    temps.append('_t%d' % next(self.names))
+                    self.line(indent, '%s = %s' % (temps[-1], self.expr(expr)))
+                for target, temp in zip(data, temps):
+                    self.assign(target, temp, indent)
+            elif opc == 'push':
+                value = self.expr(data)
+            elif opc == 'ret':
+                self.line(indent, 'return ' + value)
+                returns = True
+            elif opc == 'condition':
+                before = self.assigned
+                statement = 'if'
+                branches = [] # names set by the branches that don't return
+                for expr, block in zip(data.expr_if, data.code_if):
+                    self.assigned = before
+                    self.line(indent, '%s %s:' % (statement, self.expr(expr)))
+                    self.assigned = set(before)
+                    if not self.block(block, indent + 1):
+                        branches.append(self.assigned)
+                    statement = 'elif'
+                self.assigned = set(before)
+                if data.code_else:
+                    self.line(indent, 'else:')
+                    if not self.block(data.code_else, indent + 1):
+                        branches.append(self.assigned)
+                else:
+                    branches.append(self.assigned)
+                if branches:
+                    self.assigned = set.intersection(*branches)
+                else:
+                    self.assigned = before
+                    returns = True
+            elif opc == 'loop':
+                (target, expr), = itertools.islice(data.data.items(), 1)
+                before = self.assigned
+                self.assigned = set(before)
+                name, path = attribute_path(target)
+                if path:
+                    item = '_t%d' % next(self.names)
+                    self.line(indent, 'for %s in %s:' % (item, self.expr(expr)))
+                    self.assign(target, item, indent + 1)
+                else:
+                    self.line(indent, 'for %s in %s:' % (self.local(name),
+                                                         self.expr(expr)))
+                    self.assigned.add(name)
+                self.block(data.code, indent + 1)
+                self.assigned = before # The loop may not run
+            else:
+                raise ValueError('Unknown opcode: %s' % opc)
+        if len(self.lines) == start:
+            self.line(indent, 'pass')
+        return returns
+
+    def compile(self):
+        """ The Python function
+        """
+        fn = self.function
+        params = [self.local(name) for name in fn.args]
+        if fn.unpack is not None:
+            params.append('_u')
+            self.line(1, 'if _len(_u) != %d:' % len(fn.unpack))
+            self.line(2, 'raise _TypeError("Expected %d values to unpack, '
+                         'got %%s" %% _len(_u))' % len(fn.unpack))
+            self.line(1, '%s, = _u' % ', '.join(map(self.local, fn.unpack)))
+        self.assigned.update(fn.args, fn.unpack or ())
+        self.bind(fn.code)
+        self.block(fn.code, 1)
+        source = 'def compiled(%s):\n%s\n' % (', '.join(params),
+                                               '\n'.join(self.lines))
+        exec(source, self.namespace)
+        return self.namespace['compiled']
+
+
+class FrameCompiler(FunctionCompiler):
+    """ Compile the expressions of an interpreted Function to Python
+        functions of its frames, reading every name from the frame.
+    """
+    def name(self, name, path=()):
+        code = attribute_code('_f', slot_name(name))
+        for attr in path:
+            code = attribute_code(code, attr)
+        return code
+
+    def evaluator(self, data):
+        """ Function of a frame computing `data`. Expressions that can't be
+            compiled are computed by `calculate`.
+        """
+        try:
+            code = self.expr(data)
+            exec('def evaluate(_f):\n    return %s\n' % code, self.namespace)
+        except Exception:
+            return functools.partial(calculate, data)
+        return self.namespace['evaluate']
 
 
 ###########################################################################
@@ -469,13 +956,11 @@ class Environment(Repr):
         """ Try to find an attribute inside the environment or its parent.
             This uses the `real_attribute` syntax
         """
-        try:
-            return real_attribute(self.d, name)
-        except KeyError:
-            parent = self.d.get('__parent__')
-            if parent is not None:
-                return getattr(parent, name)
-            raise AttributeError(name)
+        obj, names = attribute_path(name)
+        value = lookup(self, obj)
+        for name in names:
+            value = getattr(value, name)
+        return value
 
     def set(self, **kw):
         """ Set attributes wit the `real_attribute` syntax.
@@ -483,7 +968,7 @@ class Environment(Repr):
             environment dict instead of the environment itself.
         """
         for k, v in kw.items():
-            real_attribute(self.d, k, v, do_set=True)
+            set_path(self.d, *attribute_path(k), v)
 
         return self
 
@@ -637,6 +1122,26 @@ if __name__ == '__main__':
     print('  for:', bar([1, 2, 3, 4]))
 
 
+# Functions compiled to Python code
+    Function.auto_compile = True
+
+    bar = Function('bar', 'x')           .\
+        set(w = 0)                       .\
+        for_(i = var.x)                  .\
+            if_(var.i % 2)               .\
+                set(w = var.w + var.i)   .\
+            end                          .\
+        end                              .\
+        ret(var.w)                       .\
+    end
+
+    print(' comp:', bar(range(13)), bar.native is not None)
+    Function.auto_compile = False
+
+    bar.native = None # Interpreted again
+    print('  int:', bar(range(13)))
+
+
 # CLASS support
 
     Environment(globals())               .\
@@ -652,3 +1157,4 @@ if __name__ == '__main__':
     end
 
     print('class:', Foo(42))
+
@@ -0,0 +1,119 @@
+"""
+    Stream the records of large files through FuncBuilder expressions.
+
+    Files are read in blocks of `CHUNK_SIZE` bytes (or through `mmap`) and
+    split in records lazily, without reading whole lines one by one. The
+    `transform` and `predicate` expressions are applied with the batch
+    `FuncBuilder.map` and `FuncBuilder.filter` methods.
+
+    >>> import os, tempfile
+    >>> from funcbuilder import f
+    >>> fd, path = tempfile.mkstemp()
+    >>> with os.fdopen(fd, 'w') as out:
+    ...     _ = out.write('a\\t1\\nb\\t22\\n\\nc\\t333\\n')
+    >>> list(stream(path, f.call('split', '\\t')[1].int, f.len))
+    [1, 22, 333]
+    >>> list(records(path, size=3, use_mmap=True))
+    ['a\\t1', 'b\\t22', '', 'c\\t333']
+
+    In bytes mode, the records are not decoded:
+
+    >>> list(stream(path, f[:1], f.call('endswith', b'2'), binary=True))
+    [b'b']
+    >>> os.remove(path)
+"""
+import itertools as it
+import mmap
+import os
+
+from funcbuilder import FuncBuilder
+
+__all__ = 'blocks', 'records', 'stream'
+
+CHUNK_SIZE = 1 << 20
+
+
+def blocks(file, size=CHUNK_SIZE, use_mmap=False):
+    """ Generator of blocks of bytes of a binary file object, or of the file
+        at the path given. With `use_mmap`, the blocks are copied from a
+        memory map of the file instead of read from it.
+    """
+    if isinstance(file, (str, bytes, os.PathLike)):
+        with open(file, 'rb') as fp:
+            yield from blocks(fp, size, use_mmap)
+        return
+
+    if not use_mmap:
+        read = file.read
+        block = read(size)
+        while block:
+            yield block
+            block = read(size)
+        return
+
+    if os.fstat(file.fileno()).st_size == 0:
+        return # Empty files can't be mapped
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for start in range(0, len(data), size):
+            yield data[start:start + size]
+
+
+def split_blocks(file, sep, size, use_mmap, binary, encoding, errors):
+    """ Generator of lists with the records of each block. Blocks without
+        a separator are kept in a list and joined once one is found, so
+        records longer than a block are copied only once.
+    """
+    text_sep = sep.decode(encoding, errors)
+    edge = len(sep) - 1 # Bytes of a separator that may be in the last block
+    pending, tail = [], b'' # Blocks after the last separator, their end
+    # Separators like b'--' overlap themselves: the last one found by
+    # `rfind` may not be where splitting the whole file would cut
+    overlaps = any(sep[i:] == sep[:-i] for i in range(1, len(sep)))
+    for block in blocks(file, size, use_mmap):
+        cut = block.rfind(sep)
+        if cut < 0 and sep not in tail + block[:edge]:
+            pending.append(block)
+            tail = (tail + block)[-edge:] if edge else b''
+            continue
+        if pending:
+            pending.append(block)
+            block = b''.join(pending)
+            cut = block.rfind(sep)
+        if overlaps:
+            cut = len(block) - len(block.split(sep)[-1]) - len(sep)
+        rest = block[cut + len(sep):]
+        pending, tail = [rest], rest[-edge:] if edge else b''
+        if binary:
+            yield block[:cut].split(sep)
+        else:
+            yield block[:cut].decode(encoding, errors).split(text_sep)
+    rest = b''.join(pending)
+    if rest:
+        yield [rest if binary else rest.decode(encoding, errors)]
+
+
+def records(file, sep=b'\n', size=CHUNK_SIZE, use_mmap=False, binary=False,
+            encoding='utf-8', errors='strict'):
+    """ Iterator of the records of a file separated by `sep`, without the
+        separator. Records are decoded a block at a time unless `binary`
+        is set, so the encoding must keep `sep` as it is (like UTF-8 and
+        ASCII do for b'\\n'). An empty last record is not generated.
+    """
+    return it.chain.from_iterable(split_blocks(file, sep, size, use_mmap,
+                                               binary, encoding, errors))
+
+
+def stream(file, transform=None, predicate=None, **options):
+    """ Iterator of `transform(record)` for the records of a file where
+        `predicate(record)` is true. The predicate is applied first, so it
+        can reject records before a more expensive transform. Other
+        arguments are given to `records`.
+    """
+    items = records(file, **options)
+    if predicate is not None:
+        items = (predicate.filter(items) if isinstance(predicate, FuncBuilder)
+                 else filter(predicate, items))
+    if transform is not None:
+        items = (transform.map(items) if isinstance(transform, FuncBuilder)
+                 else map(transform, items))
+    return items
@@ -0,0 +1,281 @@
+""" Regression tests of FuncBuilder expressions. Run from the root of the
+    repository with `python -m unittest` (or pytest).
+"""
+import collections
+import decimal
+import pickle
+import unittest
+import weakref
+
+import funcbuilder
+from funcbuilder import (FuncBuilder, Profiler, arg, compile_cache, f,
+                         function, function_final)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TestCallPaths(unittest.TestCase):
+    """ Direct calls, `compile`, `map` and `filter` give the same results
+    """
+    cases = [
+        (f + 1 - 1, 0.1),
+        (f * 3 * 5, 0.1),
+        (~~f, True),
+        (f + 0, 'a'),
+        (-(-f), collections.Counter(a=1, b=-1)),
+        (abs(abs(f)), -2.5),
+        (f.real.imag, 3 + 4j),
+    ]
+
+    def check(self, expr, value):
+        try:
+            expected = expr(value)
+        except Exception as error:
+            with self.assertRaises(type(error)):
+                expr.compile()(value)
+            with self.assertRaises(type(error)):
+                list(expr.map([value]))
+            return
+        self.assertEqual(expr.compile()(value), expected)
+        self.assertEqual(list(expr.map([value])), [expected])
+        self.assertEqual(type(expr.compile()(value)), type(expected))
+        self.assertEqual(list(expr.filter([value])),
+                         [value] if expected else [])
+
+    def test_default(self):
+        for expr, value in self.cases:
+            with self.subTest(expr=expr, value=value):
+                self.check(expr, value)
+
+    def test_auto_compile(self):
+        class Compiled(FuncBuilder):
+            auto_compile = True
+        g = Compiled()
+        for expr, value in [(g + 1 - 1, 0.1), (~~g, True), (g + 0, 'x' * 0)]:
+            with self.subTest(expr=expr):
+                self.check(expr, value)
+
+    def test_optimize_integers(self):
+        for expr in (f + 1 + 2 - 3, f * 3 * 5, -(-f), ~~f, f.real.imag):
+            with self.subTest(expr=expr):
+                for value in (-7, 0, 12):
+                    self.assertEqual(expr.optimize()(value), expr(value))
+
+    def test_auto_optimize_is_opt_in(self):
+        self.assertFalse(FuncBuilder.auto_optimize)
+
+        class Optimized(FuncBuilder):
+            auto_optimize = True
+        g = Optimized()
+        self.assertEqual((g + 1 - 1).compile()(5), 5)
+        self.assertEqual((g + 1 - 1).optimize().op, [])
+
+    def test_long_expressions(self):
+        g = f
+        for _ in range(2000):
+            g = g + 1
+        self.assertEqual(g(0), 2000)
+        self.assertEqual(g.compile()(0), 2000)
+
+    def test_pickle_and_parallel_map(self):
+        g = pickle.loads(pickle.dumps(f.imag * 2 + 1))
+        self.assertEqual(g(3j), 7.0)
+        self.assertEqual((f ** 2).parallel_map(range(5), 2), [0, 1, 4, 9, 16])
+
+
+class TestPlaceholders(unittest.TestCase):
+    """ The argument of `f` comes before the placeholders, in any order of
+        the operands
+    """
+    def test_operand_order(self):
+        for expr in (arg('x') * f, f * arg('x')):
+            with self.subTest(expr=expr):
+                self.assertEqual(expr(3, 4), 12)
+                self.assertEqual(expr.var_cnt, 1)
+        self.assertEqual((arg('x') + f.real)(2j, 1), 1.0)
+        self.assertEqual((f.real + arg('x'))(2j, 1), 1.0)
+        self.assertEqual((arg('y') - f)(5, 2), -3)
+        self.assertEqual((f - arg('y'))(5, 2), 3)
+
+    def test_single_argument(self):
+        g = arg('x') * (f + f) - f
+        self.assertEqual(g(2, 3), 10)
+        self.assertEqual(list(g.map([(2, 3), (1, 1)])), [10, 1])
+
+
+class TestCompileCache(unittest.TestCase):
+
+    def setUp(self):
+        compile_cache.cache_clear()
+
+    def test_shared_structure(self):
+        self.assertIs((f.real * 2).compile(), (f.real * 2).compile())
+        self.assertIsNot((f.real * 2).compile(), (f.real * 3).compile())
+
+    def test_equal_but_distinct_constants(self):
+        pairs = [
+            (0.0, -0.0),
+            (1, 1.0),
+            (1, True),
+            (decimal.Decimal('1.0'), decimal.Decimal('1.00')),
+            (frozenset({1}), frozenset({True})),
+            ((1,), (True,)),
+            ({1: 'a'}, {True: 'a'}),
+            ({0.0: 1}, {-0.0: 1}),
+        ]
+        for a, b in pairs:
+            with self.subTest(a=a, b=b):
+                self.assertEqual((f + (a,)).compile()(()), (a,))
+                got = (f + (b,)).compile()(())
+                self.assertEqual(repr(got), repr((b,)))
+
+    def test_dict_keys(self):
+        f.call('update', {1: 'a'}).compile()
+        data = {}
+        f.call('update', {True: 'a'}).compile()(data)
+        self.assertIs(next(iter(data)), True)
+
+    def test_negative_zero(self):
+        (f * 0.0).compile()
+        self.assertEqual(repr((f * -0.0).compile()(1.0)), '-0.0')
+
+    def test_decimal_constants(self):
+        one, one_ = decimal.Decimal('1.0'), decimal.Decimal('1.00')
+        (f + one).compile()
+        self.assertEqual(str((f + one_).compile()(0)), '1.00')
+
+    def test_cached_expressions_are_not_shared(self):
+        g = (f + 1).cached()
+        with self.assertRaises(TypeError):
+            g.fingerprint()
+        h = (f + 1).cached()
+        self.assertEqual((g * 2).compile()(1), 4)
+        self.assertIsNot((g * 2).compile(), (h * 2).compile())
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class TestVectorized(unittest.TestCase):
+
+    def check(self, expr, values, same_types=True):
+        array = numpy.array(values)
+        expected = [expr(x) for x in array.tolist()]
+        got = expr.vectorized(array).tolist()
+        self.assertEqual(got, expected)
+        if same_types:
+            self.assertEqual([type(i) for i in got],
+                             [type(i) for i in expected])
+
+    def test_arithmetic(self):
+        self.check((f ** 2 - 1) * 3, [0, 1, 2, 3])
+        self.check(abs(-f) + 0.5, [-1.5, 2.0])
+
+    def test_select_numbers(self):
+        self.check((f > 0).if_else(f * 10, 0), [2, -1, 3])
+        # Numeric branches share a numpy type, like numpy.where
+        self.check((f > 0).if_else(f * 1.5, f), [2, -1], same_types=False)
+        self.check(f.and_then(f + 1), [0, 1, 2])
+        self.check(f.or_else(-1), [0, 1, 2])
+
+    def test_select_objects(self):
+        self.check((f > 0).if_else('+', '-'), [2, -1, 0])
+        self.check((f > 0).if_else(f), [2, -1])
+        self.check((f < 0).or_else('zero'), [0, -1])
+
+    def test_round(self):
+        self.check(f.round, [1.4, 2.6])
+
+    def test_numpy_errors_fall_back(self):
+        self.check(f ** -1, [1, 2, 4])
+        with self.assertRaises(ValueError):
+            (f ** -1).vectorized(numpy.array([1, 2]), fallback=False)
+
+    def test_not_vectorized(self):
+        self.check(f.str.len, [1, 22, 333])
+        with self.assertRaises(TypeError):
+            f.str.len.vectorized(numpy.array([1]), fallback=False)
+
+    def test_empty(self):
+        for expr in (f.str.len, f.coalesce(1), f ** -1, f + 1):
+            with self.subTest(expr=expr):
+                self.assertEqual(expr.vectorized(numpy.array([])).tolist(), [])
+
+    def test_object_arrays(self):
+        array = numpy.arange(4, dtype=object)
+        self.assertEqual((f ** 40).vectorized(array).tolist(),
+                         [x ** 40 for x in range(4)])
+
+
+class TestProfiler(unittest.TestCase):
+
+    def tearDown(self):
+        FuncBuilder.profiler = None
+
+    def test_global_profiler(self):
+        profiler = Profiler()
+        FuncBuilder.profiler = profiler
+        g = f.real * 2
+        self.assertEqual(g(3), 6)
+        self.assertEqual([calls for _, calls, _, _ in profiler.table()], [1, 1])
+
+    def test_global_profiler_with_placeholders(self):
+        FuncBuilder.profiler = Profiler()
+        self.assertEqual((arg('x') + 1)(1), 2)
+        self.assertEqual((arg('x') * arg('y'))(2, 3), 6)
+        self.assertEqual((f - arg('y'))(5, 2), 3)
+
+    def test_profiled(self):
+        profiler = Profiler()
+        g = f.call('strip').int.profiled(profiler)
+        self.assertEqual([g(x) for x in (' 1', '2 ')], [1, 2])
+        with self.assertRaises(TypeError):
+            arg('x').profiled(profiler)
+
+
+class Builder(FuncBuilder):
+
+    @function
+    def twice(self):
+        return (lambda x: x * 2), ('twice',)
+
+    @function_final
+    def plus(self, n):
+        return (lambda x: self(x) + n), ('plus', n)
+
+
+class TestDecorators(unittest.TestCase):
+
+    def test_function(self):
+        g = (Builder() + 1).twice()
+        self.assertEqual(g.op, [('add', 1), ('twice',)])
+        self.assertEqual((g(3), g.compile()(3)), (8, 8))
+
+    def test_function_final(self):
+        g = (Builder() * 3).plus(1) + 1
+        self.assertEqual(g.op, [('mul', 3), ('plus', 1), ('add', 1)])
+        self.assertEqual((g(2), g.compile()(2)), (8, 8))
+        g = (g * 2).plus(5)
+        self.assertEqual(g.op[-2:], [('mul', 2), ('plus', 5)])
+        self.assertEqual((g(2), g.compile()(2)), (21, 21))
+
+    def test_weakref(self):
+        g = f + 1
+        self.assertIs(weakref.ref(g)(), g)
+
+    def test_builtin_property(self):
+        class Meta(funcbuilder.OperatorMachinery, funcbuilder.BuiltinMachinery):
+            pass
+
+        class Value(metaclass=Meta):
+            def __init__(self, operand):
+                self.operand = operand
+        Value.apply_operators()
+        Value.apply_builtins(Value.builtin_property)
+        self.assertEqual(Value(-2).abs.operand, 2)
+        self.assertEqual((Value(2) + 1).operand, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
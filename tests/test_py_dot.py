@@ -0,0 +1,184 @@
+""" Regression tests of py_dot functions, interpreted and compiled to Python
+"""
+import unittest
+
+from funcbuilder.py_dot import Class, Environment, Function, Lambda, var
+
+
+def sign():
+    return (Function('sign', 'x')
+        .if_(var.x > 0)
+            .ret('+')
+        .elif_(var.x < 0)
+            .ret('-')
+        .else_
+            .ret('0')
+        .end
+    .end)
+
+def odd_sum():
+    return (Function('odd_sum', 'x')
+        .set(w=0)
+        .for_(i=var.x)
+            .if_(var.i % 2)
+                .set(w=var.w + var.i)
+            .end
+        .end
+        .ret(var.w)
+    .end)
+
+def keywords():
+    return (Function('keywords', 'x')
+        .set(**{'lambda': var.x + 1})
+        .ret(var.attr('lambda') * 2)
+    .end)
+
+def unpack():
+    return (Lambda(unpack=('x', 'y'))
+        .set(z=var.x ** 2)
+        .ret(var.y + var.z)
+    .end)
+
+
+class TestCompiled(unittest.TestCase):
+    """ Compiled functions give the results of the interpreter
+    """
+    cases = [
+        (sign, [(3,), (-1,), (0,)]),
+        (odd_sum, [(range(13),), ([],)]),
+        (keywords, [(1,), (-5,)]),
+        (unpack, [((1, 2),), ((3, -4),)]),
+    ]
+
+    def test_results(self):
+        for make, calls in self.cases:
+            interpreted, compiled = make(), make().compile()
+            self.assertIsNone(interpreted.native)
+            self.assertIsNotNone(compiled.native)
+            for args in calls:
+                with self.subTest(function=make.__name__, args=args):
+                    self.assertEqual(compiled(*args), interpreted(*args))
+
+    def test_environment_names(self):
+        env = Environment().set(d=10, last=20, set=30)
+        cls = Class('Point', parent=env).set(name=1, bases=2, parent=3)
+        names = {env: ('d', 'last', 'set'), cls: ('name', 'bases', 'parent')}
+        for environ, attrs in names.items():
+            for name in attrs:
+                def make():
+                    return Function('read', 'x', environ=environ).ret(
+                        var.x + var.attr(name))
+                with self.subTest(environ=environ, name=name):
+                    self.assertEqual(make().compile()(1), make()(1))
+
+    def test_builtin_names(self):
+        def make():
+            return Lambda('TypeError', 'len', unpack=('a',)).ret(
+                var.TypeError + var.attr('len') + var.a).end
+        interpreted, compiled = make(), make().compile()
+        self.assertEqual(compiled(1, 2, (3,)), interpreted(1, 2, (3,)))
+        for function in (interpreted, compiled):
+            with self.assertRaises(TypeError):
+                function(1, 2, (3, 4))
+
+    def test_keyword_arguments(self):
+        add = Function('add', 'x', 'y').ret(var.x - var.y).end
+        self.assertEqual(add(5, y=2), 3)
+        add.compile()
+        self.assertEqual(add(5, y=2), 3)
+        with self.assertRaises(TypeError):
+            add(5)
+        for function in (add, Function('add', 'x', 'y').ret(var.x).end):
+            with self.assertRaisesRegex(TypeError, "keyword.*'z'"):
+                function(5, z=2)
+            with self.assertRaisesRegex(TypeError, "values for.*'x'"):
+                function(5, x=2)
+
+    def test_keyword_arguments_unpack(self):
+        for function in (unpack(), unpack().compile()):
+            with self.assertRaises(TypeError):
+                function(x=1)
+
+    def test_auto_compile(self):
+        Function.auto_compile = True
+        try:
+            function = odd_sum()
+        finally:
+            Function.auto_compile = False
+        self.assertIsNotNone(function.native)
+        self.assertEqual(function(range(5)), 4)
+
+    def test_read_before_set(self):
+        def make():
+            return (Function('maybe', 'x')
+                .if_(var.x)
+                    .set(y=1)
+                .end
+                .ret(var.y)
+            .end)
+        with self.assertRaises(TypeError):
+            make().compile()
+
+        Function.auto_compile = True
+        try:
+            function = make()
+        finally:
+            Function.auto_compile = False
+        self.assertIsNone(function.native)
+        self.assertEqual(function(True), 1)
+        with self.assertRaises(AttributeError):
+            function(False)
+
+    def test_set_in_all_branches(self):
+        function = (Function('branches', 'x')
+            .if_(var.x)
+                .set(y=1)
+            .else_
+                .set(y=2)
+            .end
+            .ret(var.y)
+        .end).compile()
+        self.assertEqual([function(True), function(False)], [1, 2])
+
+
+class TestChanges(unittest.TestCase):
+    """ Code added after a call is used by the next calls
+    """
+    def test_interpreted(self):
+        function = Function('double', 'x').set(y=var.x * 2)
+        self.assertIsNone(function(1))
+        function.ret(var.y)
+        self.assertEqual(function(2), 4)
+
+    def test_compiled(self):
+        function = Function('double', 'x').set(y=var.x * 2).compile()
+        self.assertIsNone(function(1))
+        function.ret(var.y)
+        self.assertIsNone(function.native)
+        self.assertEqual(function(2), 4)
+
+    def test_blocks(self):
+        function = Function('clip', 'x').set(y=var.x)
+        cond = function.if_(var.x > 10)
+        self.assertIsNone(function(20))
+        cond.set(y=10).end.ret(var.y)
+        self.assertEqual([function(20), function(5)], [10, 5])
+
+
+class TestEnvironment(unittest.TestCase):
+
+    def test_class(self):
+        env = Environment()
+        (env.class_('Point')
+            .def_(__init__=('self', 'x'))
+                .set(self__x=var.x)
+            .end
+            .def_(double=('self',))
+                .ret(var.self.x * 2)
+            .end
+        .end)
+        self.assertEqual(env.Point(21).double(), 42)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+""" Regression tests of the records of streamed files
+"""
+import io
+import os
+import tempfile
+import unittest
+
+from funcbuilder import f
+from funcbuilder.stream import records, stream
+
+
+class TestRecords(unittest.TestCase):
+
+    def check(self, data, sep):
+        expected = data.split(sep)
+        if expected[-1] == b'':
+            expected.pop()
+        for size in (1, 2, 3, 5, 64):
+            with self.subTest(sep=sep, size=size):
+                got = list(records(io.BytesIO(data), sep, size, binary=True))
+                self.assertEqual(got, expected)
+
+    def test_separators(self):
+        data = b'a--b----c-d---\n--e-'
+        for sep in (b'-', b'--', b'---', b'\n--', b'x'):
+            self.check(data, sep)
+
+    def test_long_records(self):
+        self.check(b'x' * 1000 + b'\r\n' + b'y' * 999 + b'\r\nz', b'\r\n')
+        self.check(b'\r\n' * 10, b'\r\n')
+
+    def test_mmap_and_text(self):
+        fd, path = tempfile.mkstemp()
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'wb') as out:
+            out.write('α\t1\nβ\t22\n\n'.encode() * 50)
+        expected = ['α\t1', 'β\t22', ''] * 50
+        for use_mmap in (False, True):
+            with self.subTest(use_mmap=use_mmap):
+                self.assertEqual(list(records(path, size=7, use_mmap=use_mmap)),
+                                 expected)
+        numbers = stream(path, f.call('split', '\t')[1].int, f.len, size=4)
+        self.assertEqual(sum(numbers), 23 * 50)
+
+    def test_empty(self):
+        self.assertEqual(list(records(io.BytesIO(b''))), [])
+
+
+if __name__ == '__main__':
+    unittest.main()